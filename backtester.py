@@ -1,63 +1,194 @@
-import json
-import pandas as pd
-import requests
+import argparse
+import os
 import numpy as np
 
-# Load API keys from JSON file
-with open("config.json", "r") as file:
-    config = json.load(file)
-    fred_api_key = config["fred_api_key"]
-
-
-# Function to get data from FRED
-def fetch_fred_data(series_id, api_key):
-    url = f"https://api.stlouisfed.org/fred/series/observations?series_id={series_id}&api_key={api_key}&file_type=json"
-    response = requests.get(url)
-    data = response.json()["observations"]
-    df = pd.DataFrame(data)
-    df["date"] = pd.to_datetime(df["date"])
-    df.set_index("date", inplace=True)
-    df["value"] = pd.to_numeric(df["value"], errors="coerce")
-    return df
-
-
-# Fetch VIX and S&P 500 data from FRED
-vix_data = fetch_fred_data("VIXCLS", fred_api_key)
-sp500_data = fetch_fred_data("SP500", fred_api_key)
-
-print("Fetched VIX data points:", len(vix_data))
-print("Fetched S&P 500 data points:", len(sp500_data))
-print("Please wait. This may take a minute or two...")
-
-# Precompute Rolling Ranks for all lookback periods
-rolling_ranks = {}
-for lookback in range(10, 101):
-    rolling_ranks[lookback] = (
-        vix_data["value"]
-        .rolling(lookback)
-        .apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100)
-    )
-
-results = {}
-for lookback in range(10, 101):
-    for i in range(10, 101):
-        date_range = vix_data[rolling_ranks[lookback] < i].index
-        sp500_subset = sp500_data[sp500_data.index.isin(date_range)]
-        if not sp500_subset.empty:
-            pl = (
-                (sp500_subset["value"].iloc[-1] - sp500_subset["value"].iloc[0])
-                / sp500_subset["value"].iloc[0]
-            ) * 100
-            results_key = f"Lookback {lookback}, Threshold {i}"
-            results[results_key] = pl
-            # print(f"{results_key}: {pl:.2f}% P/L")
-        else:
-            print(f"No data for Lookback {lookback}, Threshold {i}")
-
-# After all results are calculated, sort and print in descending order
-sorted_results = sorted(results.items(), key=lambda x: x[1], reverse=True)
-
-# Display only the top 10 results
-print("\nTop 10 Results:")
-for key, value in sorted_results[:10]:
-    print(f"{key}: {value:.2f}% P/L")
+from vixlib.cache import ResultCache
+from vixlib.cli import parse_outlier_sigma, parse_range
+from vixlib.metrics import RISK_METRICS
+from vixlib.percentile import rolling_percentile_matrix
+from vixlib.sketch import accuracy_report, approximate_rolling_percentile_matrix
+from vixlib.store import load_series
+from vixlib.sweep import (
+    RANKING_METRICS,
+    adaptive_sweep,
+    candidate_metrics,
+    grid_sweep,
+    common_positions,
+    walk_forward,
+    walk_forward_folds,
+    walk_forward_report,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sweep VIX percentile lookbacks and thresholds")
+    parser.add_argument(
+        "--lookbacks", type=int, nargs="+", default=[10, 101, 1], metavar="N",
+        help="lookback range as START STOP [STEP] (default: 10 101 1), e.g. 252 2521 21 for 1y-10y",
+    )
+    parser.add_argument(
+        "--skip-holidays", action="store_true",
+        help="rank VIX over trading days only; without it any window containing a FRED holiday is NaN, "
+        "which leaves nothing to rank on lookbacks longer than a few weeks",
+    )
+    parser.add_argument(
+        "--approximate", type=float, metavar="ACCURACY",
+        help="use the log-bucket sketch with this relative accuracy (e.g. 0.01) instead of exact ranks",
+    )
+    parser.add_argument(
+        "--accuracy-report", action="store_true",
+        help="compare the approximate engine with the exact one on these lookbacks and exit",
+    )
+    parser.add_argument(
+        "--rank-by", choices=RANKING_METRICS, default="total_return",
+        help="metric used to sort the results (default: total_return, the P/L)",
+    )
+    parser.add_argument(
+        "--search", choices=("grid", "halving"), default="grid",
+        help="evaluate every cell, or use successive halving: score the grid on a subsample of the "
+        "history and keep only the best third for each finer pass (default: grid)",
+    )
+    parser.add_argument(
+        "--outlier-sigmas", type=parse_outlier_sigma, nargs="+", metavar="SIGMA",
+        help="with --search halving, also search these outlier filters, in standard deviations or 'none' "
+        "(default: none)",
+    )
+    parser.add_argument(
+        "--exit-offsets", type=int, nargs="+", metavar="N",
+        help="with --search halving, also search exit thresholds this many points above the entry threshold",
+    )
+    parser.add_argument(
+        "--min-holds", type=int, nargs="+", metavar="DAYS",
+        help="with --search halving, also search minimum holding periods, in trading days",
+    )
+    parser.add_argument(
+        "--cooldowns", type=int, nargs="+", metavar="DAYS",
+        help="with --search halving, also search cooldowns after an exit, in trading days",
+    )
+    parser.add_argument(
+        "--walk-forward", type=int, nargs=2, metavar=("TRAIN", "TEST"),
+        help="re-optimize on each TRAIN trading days and trade the next TEST days out of sample, "
+        "e.g. 504 63 for two years / one quarter",
+    )
+    parser.add_argument(
+        "--anchored", action="store_true",
+        help="with --walk-forward, train on all the history before each test window",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="number of worker processes for --walk-forward folds (default: all CPUs)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="recompute every result instead of reusing the ones stored in the result cache",
+    )
+    args = parser.parse_args()
+    try:
+        args.lookbacks = parse_range(args.lookbacks)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if args.walk_forward and (args.walk_forward[0] < 2 or args.walk_forward[1] < 1):
+        parser.error("--walk-forward needs TRAIN >= 2 and TEST >= 1")
+    if args.search != "halving" and (args.outlier_sigmas or args.exit_offsets or args.min_holds or args.cooldowns):
+        parser.error("--outlier-sigmas, --exit-offsets, --min-holds and --cooldowns need --search halving")
+    return args
+
+
+def main():
+    args = parse_args()
+    cache = None if args.no_cache else ResultCache()
+
+    # Load VIX and S&P 500 data from the local store (refresh it with fred_sync.py)
+    vix_data = load_series("VIXCLS")
+    sp500_data = load_series("SP500")
+
+    print("Fetched VIX data points:", len(vix_data))
+    print("Fetched S&P 500 data points:", len(sp500_data))
+
+    vix_values = vix_data["value"].dropna() if args.skip_holidays else vix_data["value"]
+    lookbacks = list(args.lookbacks)
+
+    if args.accuracy_report:
+        print(accuracy_report(vix_values.to_numpy(), lookbacks).to_string())
+        return
+
+    # Precompute Rolling Ranks for all lookback periods in a single pass
+    if args.approximate:
+        rolling_ranks = approximate_rolling_percentile_matrix(vix_values, lookbacks, args.approximate)
+    else:
+        rolling_ranks = rolling_percentile_matrix(vix_values, lookbacks)
+
+    # Align S&P 500 prices and VIX ranks once, on the dates where both have a value
+    sp500_prices = sp500_data["value"].dropna()
+    sp500_pos, vix_pos = common_positions(sp500_prices.index, vix_values.index)
+    prices = sp500_prices.to_numpy()[sp500_pos]
+    aligned_ranks = rolling_ranks[vix_pos]
+
+    thresholds = list(range(10, 101))
+    if args.walk_forward:
+        dates = sp500_prices.index.date[sp500_pos]
+        folds = walk_forward_folds(len(prices), *args.walk_forward, anchored=args.anchored)
+        result = walk_forward(
+            prices, aligned_ranks, thresholds, folds, rank_by=args.rank_by, workers=args.workers,
+            cache=cache,
+        )
+        print(walk_forward_report(result, dates, lookbacks).to_string(index=False))
+        print(f"Out-of-sample Cumulative Return: {result.total_return:.2f}%")
+        if result.metrics is not None:
+            print(f"Out-of-sample Sharpe: {result.metrics['sharpe']:.2f}")
+            print(f"Out-of-sample Max Drawdown: {result.metrics['max_drawdown']:.2f}%")
+        print(f"Buy and Hold Return over the same period: {result.buy_and_hold_return:.2f}%")
+        return
+
+    if args.search == "halving":
+        search = adaptive_sweep(
+            prices, aligned_ranks, thresholds, args.outlier_sigmas or [None],
+            args.exit_offsets or [0], args.min_holds or [0], args.cooldowns or [0], rank_by=args.rank_by,
+        )
+        saved = (1 - search.cost / search.grid_size) * 100
+        print(
+            f"Successive halving: {search.evaluations} evaluations ({search.cost:.1f} on the full history) "
+            f"instead of {search.grid_size}, {saved:.1f}% saved"
+        )
+        if search.best is None:
+            print("No parameters traded")
+            return
+        column, threshold, outlier_sigma, exit_offset, min_hold, cooldown = search.best
+        metrics = candidate_metrics(prices, aligned_ranks, [search.best])
+        print(f"Best VIX_THRESHOLD: {threshold}")
+        print(f"Best LOOKBACK_DAYS: {lookbacks[column]}")
+        print(f"Best outlier filter: {'none' if outlier_sigma is None else outlier_sigma}")
+        print(f"Best exit threshold: {threshold + exit_offset}")
+        print(f"Best minimum hold: {min_hold}")
+        print(f"Best cooldown: {cooldown}")
+        for name in RISK_METRICS:
+            print(f"{name}: {metrics[name][0]:.2f}")
+        return
+
+    # Score every (lookback, threshold) pair in one vectorized sweep
+    grid = grid_sweep(prices, aligned_ranks, thresholds, outlier_sigma=None, cache=cache)
+
+    results = {}
+    for column, lookback in enumerate(lookbacks):
+        for row, i in enumerate(thresholds):
+            if not np.isnan(grid["total_return"][column, row]):
+                results_key = f"Lookback {lookback}, Threshold {i}"
+                results[results_key] = {name: values[column, row] for name, values in grid.items()}
+            else:
+                print(f"No data for Lookback {lookback}, Threshold {i}")
+
+    # After all results are calculated, sort and print in descending order
+    sorted_results = sorted(results.items(), key=lambda x: x[1][args.rank_by], reverse=True)
+
+    # Display only the top 10 results
+    print(f"\nTop 10 Results by {args.rank_by}:")
+    for key, value in sorted_results[:10]:
+        print(
+            f"{key}: {value['total_return']:.2f}% P/L, Sharpe {value['sharpe']:.2f}, "
+            f"Sortino {value['sortino']:.2f}, Max Drawdown {value['max_drawdown']:.2f}%, "
+            f"Calmar {value['calmar']:.2f}, Time in Market {value['time_in_market']:.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
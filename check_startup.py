@@ -0,0 +1,47 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Wall time a cold signal check may take on a typical Linux box, interpreter start included
+STARTUP_BUDGET_SECONDS = 0.3
+
+# Signal checks that run from cron and must stay cheap to start
+SIGNAL_CHECKS = [
+    ["prediction.py"],
+    ["vix_percentile_observer.py", "--latest"],
+]
+
+
+def time_command(command, runs):
+    """Median wall time of `runs` fresh interpreters running `command`."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that signal checks start within budget")
+    parser.add_argument(
+        "--budget", type=float, default=STARTUP_BUDGET_SECONDS,
+        help=f"maximum median wall time in seconds (default: {STARTUP_BUDGET_SECONDS})",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="runs per check (default: 5)")
+    args = parser.parse_args()
+
+    over_budget = False
+    for command in SIGNAL_CHECKS:
+        elapsed = time_command(command, args.runs)
+        status = "ok" if elapsed <= args.budget else "OVER BUDGET"
+        over_budget |= elapsed > args.budget
+        print(f"{' '.join(command)}: {elapsed * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms) {status}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import json
+import numpy as np
+
+from vixlib.config import load_config
+from vixlib.store import (
+    FRED_OBSERVATIONS_URL,
+    MAX_CONCURRENT_REQUESTS,
+    REVISION_DAYS,
+    load_arrays,
+    load_series,
+    sync_many,
+)
+
+# Series kept in the local store, with the interchange files refreshed after each sync
+SERIES_EXPORTS = {
+    "VIXCLS": "vix_data.csv",
+    "SP500": "sp500_data.csv",
+}
+
+
+def _format_value(value, previous):
+    if np.isnan(value):
+        return "."
+    # Keep the string already exported (FRED's own) while the value is unchanged, so the file
+    # only changes where the data did; new or revised values use the two decimals FRED uses
+    if previous not in (None, ".") and float(previous) == value:
+        return previous
+    return f"{value:.2f}"
+
+
+def export_json(series_id):
+    """Write the stored series to <series_id>.json as date/value string pairs."""
+    json_path = f"{series_id}.json"
+    try:
+        with open(json_path, "r") as json_file:
+            previous = {entry["date"]: entry["value"] for entry in json.load(json_file)}
+    except FileNotFoundError:
+        previous = {}
+
+    dates, values = load_arrays(series_id)
+    day_strings = np.asarray(dates).astype("datetime64[D]").astype(str)
+    filtered_data = [
+        {"date": day, "value": _format_value(value, previous.get(day))}
+        for day, value in zip(day_strings, np.asarray(values).tolist())
+    ]
+    with open(json_path, "w") as json_file:
+        json.dump(filtered_data, json_file, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the local FRED store")
+    parser.add_argument(
+        "series", nargs="*",
+        help="extra FRED series to keep in the store besides VIXCLS and SP500, e.g. VXN OVX VIX3M",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=MAX_CONCURRENT_REQUESTS,
+        help=f"maximum concurrent requests to FRED (default: {MAX_CONCURRENT_REQUESTS})",
+    )
+    parser.add_argument(
+        "--revision-days", type=int, default=REVISION_DAYS,
+        help=f"calendar days before the last stored observation to re-download (default: {REVISION_DAYS})",
+    )
+    parser.add_argument(
+        "--api-url", default=FRED_OBSERVATIONS_URL,
+        help="FRED observations endpoint, e.g. a local stand-in for testing",
+    )
+    args = parser.parse_args()
+
+    fred_api_key = load_config()["fred_api_key"]
+
+    series_ids = list(SERIES_EXPORTS) + [s for s in args.series if s not in SERIES_EXPORTS]
+    results = sync_many(
+        series_ids,
+        fred_api_key,
+        max_workers=args.workers,
+        revision_days=args.revision_days,
+        url=args.api_url,
+    )
+
+    for series_id, (added, revised) in results.items():
+        print(f"{series_id}: {added} new observations, {revised} revised")
+        csv_path = SERIES_EXPORTS.get(series_id)
+        if csv_path and (added or revised):
+            export_json(series_id)
+            # Save the data and value only to CSV files after purging the NaN values
+            load_series(series_id).dropna().rename(columns={"value": "close"}).to_csv(csv_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,112 +1,68 @@
-import json
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-import requests
 import quandl
 
+from vixlib.backtest import run_backtest
+from vixlib.cli import add_output_arguments, output_figures
+from vixlib.config import load_config
+from vixlib.percentile import expanding_percentile_rank, rolling_percentile_rank
+from vixlib.plotting import regime_chart
+from vixlib.regimes import RegimeIndex
+from vixlib.store import load_series
+
 # User-configurable settings
 VIX_THRESHOLD = 50
 LOOKBACK_DAYS = 20
 
-# Load API keys from JSON file
-with open("config.json", "r") as file:
-    config = json.load(file)
-    fred_api_key = config["fred_api_key"]
-    quandl_api_key = config["quandl_api_key"]
-
-quandl.ApiConfig.api_key = quandl_api_key
-
 
-# Function to get data from FRED
-def fetch_fred_data(series_id, api_key):
-    url = f"https://api.stlouisfed.org/fred/series/observations?series_id={series_id}&api_key={api_key}&file_type=json"
-    response = requests.get(url)
-    data = response.json()["observations"]
-    df = pd.DataFrame(data)
-    df["date"] = pd.to_datetime(df["date"])
-    df.set_index("date", inplace=True)
-    df["value"] = pd.to_numeric(df["value"], errors="coerce")
-    return df
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backtest going long gold while the VIX percentile is high")
+    add_output_arguments(parser)
+    return parser.parse_args()
 
 
-# Fetch VIX data from FRED
-vix_data = fetch_fred_data("VIXCLS", fred_api_key)
+def main():
+    args = parse_args()
+    quandl.ApiConfig.api_key = load_config()["quandl_api_key"]
 
-# Fetch LBMA Gold Price Data from Quandl
-gold_data = quandl.get("LBMA/GOLD")["USD (AM)"]
+    # Load VIX data from the local store (refresh it with fred_sync.py)
+    vix_data = load_series("VIXCLS")
 
-# Calculate the VIX percentiles
-vix_data["Percentile"] = vix_data["value"].rank(pct=True) * 100
-vix_data["Rolling Percentile"] = (
-    vix_data["value"]
-    .rolling(window=LOOKBACK_DAYS)
-    .apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100)
-)
-vix_data["Rolling Percentile"].fillna(vix_data["Percentile"], inplace=True)
+    # Fetch LBMA Gold Price Data from Quandl
+    gold_data = quandl.get("LBMA/GOLD")["USD (AM)"]
 
-# Align gold data with VIX data
-aligned_data = pd.concat([gold_data, vix_data["Rolling Percentile"]], axis=1).dropna()
+    # Calculate the VIX percentiles
+    vix_data["Percentile"] = expanding_percentile_rank(vix_data["value"])
+    vix_data["Rolling Percentile"] = rolling_percentile_rank(vix_data["value"], LOOKBACK_DAYS)
+    vix_data["Rolling Percentile"] = vix_data["Rolling Percentile"].fillna(vix_data["Percentile"])
 
-# Calculate P/L% for the entire duration
-long_term_entry = aligned_data["USD (AM)"].iloc[0]
-long_term_exit = aligned_data["USD (AM)"].iloc[-1]
-long_term_pl_percentage = ((long_term_exit - long_term_entry) / long_term_entry) * 100
+    # Align gold data with VIX data
+    aligned_data = pd.concat([gold_data, vix_data["Rolling Percentile"]], axis=1).dropna()
 
-# Calculate P/L% for the strategy
-strategy_data = aligned_data[aligned_data["Rolling Percentile"] > VIX_THRESHOLD]
-strategy_pl_percentage = (
-    (strategy_data["USD (AM)"].iloc[-1] - strategy_data["USD (AM)"].iloc[0])
-    / strategy_data["USD (AM)"].iloc[0]
-) * 100
-
-# Plotting
-plt.figure(figsize=(14, 7))
-plt.plot(aligned_data.index, aligned_data["USD (AM)"], linestyle="-", color="red")
-
-is_above_threshold = aligned_data["Rolling Percentile"] > VIX_THRESHOLD
-start_date = None
-for date, above in is_above_threshold.items():
-    if above and start_date is None:
-        start_date = date
-    elif not above and start_date:
-        plt.plot(
-            aligned_data[start_date:date].index,
-            aligned_data[start_date:date]["USD (AM)"],
-            marker="o",
-            markersize=1,
-            color="blue",
-            linestyle="-",
-        )
-        start_date = None
-if start_date:
-    plt.plot(
-        aligned_data[start_date:].index,
-        aligned_data[start_date:]["USD (AM)"],
-        marker="o",
-        markersize=1,
-        color="blue",
-        linestyle="-",
+    # Calculate P/L% for the strategy (long gold while VIX is above the threshold) and for the entire duration
+    result = run_backtest(
+        aligned_data["USD (AM)"].to_numpy(),
+        (aligned_data["Rolling Percentile"] > VIX_THRESHOLD).to_numpy(),
+        outlier_sigma=None,
+    )
+    long_term_pl_percentage = result.buy_and_hold_return
+    strategy_pl_percentage = result.total_return
+
+    # Plotting: gold in red with the runs held long overlaid in blue
+    regimes = RegimeIndex.from_mask(aligned_data["Rolling Percentile"] > VIX_THRESHOLD)
+    chart = dict(
+        dates=aligned_data.index,
+        prices=aligned_data["USD (AM)"],
+        regimes=regimes,
+        title="Gold Prices with Color Change based on VIX Percentile",
+        ylabel="Gold Price in USD",
+        annotations=[
+            dict(text=f"Total P/L from Strategy: {strategy_pl_percentage:.2f}%", xy=(0.02, 0.95), color="blue"),
+            dict(text=f"P/L from Long-Term Holding: {long_term_pl_percentage:.2f}%", xy=(0.02, 0.90), color="green"),
+        ],
     )
+    output_figures(args, [("gld_long_strategy", regime_chart, chart)])
 
-# Annotations
-plt.annotate(
-    f"Total P/L from Strategy: {strategy_pl_percentage:.2f}%",
-    (0.02, 0.95),
-    xycoords="axes fraction",
-    fontsize=10,
-    color="blue",
-)
-plt.annotate(
-    f"P/L from Long-Term Holding: {long_term_pl_percentage:.2f}%",
-    (0.02, 0.90),
-    xycoords="axes fraction",
-    fontsize=10,
-    color="green",
-)
 
-plt.title("Gold Prices with Color Change based on VIX Percentile")
-plt.xlabel("Date")
-plt.ylabel("Gold Price in USD")
-plt.grid(True)
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,11 @@
-import pandas as pd
+from vixlib.store import tail_json_snapshot
 
-# Load VIX data
-vix_data = pd.read_json('VIXCLS.json')
-
-# Convert VIX values to numeric
-vix_data['value'] = pd.to_numeric(vix_data['value'], errors='coerce')
+# Load only the two latest VIX observations (seeks to the end of the binary snapshot of VIXCLS.json)
+_, vix_values = tail_json_snapshot('VIXCLS.json', 2)
 
 # Calculate the change in VIX
-last_vix = vix_data['value'].iloc[-1]
-previous_vix = vix_data['value'].iloc[-2]
+last_vix = vix_values[-1]
+previous_vix = vix_values[-2]
 vix_change = last_vix - previous_vix
 
 # Regression coefficients from our analysis
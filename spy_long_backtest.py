@@ -1,75 +1,203 @@
-import json
+import argparse
+import os
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import requests
-
-# Load API keys from JSON file
-with open("config.json", "r") as file:
-    config = json.load(file)
-    fred_api_key = config["fred_api_key"]
-
-# Function to get data from FRED
-def fetch_fred_data(series_id, api_key):
-    url = f"https://api.stlouisfed.org/fred/series/observations?series_id={series_id}&api_key={api_key}&file_type=json"
-    response = requests.get(url)
-    data = response.json()["observations"]
-    df = pd.DataFrame(data)
-    df["date"] = pd.to_datetime(df["date"])
-    df.set_index("date", inplace=True)
-    df["value"] = pd.to_numeric(df["value"], errors="coerce")
-    return df
-
-# Fetch VIX and S&P 500 data from FRED
-vix_data = fetch_fred_data("VIXCLS", fred_api_key)
-sp500_data = fetch_fred_data("SP500", fred_api_key)
-
-# Define the ranges for the VIX_THRESHOLD and LOOKBACK_DAYS to test
-best_return = -float('inf')  # Initialize best cumulative return to a very low value
-best_vix_threshold = None
-best_lookback_days = None
-
-for VIX_THRESHOLD in range(30, 51, 1):  # Step by 5
-    for LOOKBACK_DAYS in range(5, 20, 1):  # Step by 20
-
-        # Calculate the overall percentile of each day's VIX value over the dataset
-        vix_data["Percentile"] = vix_data["value"].rank(pct=True) * 100
-
-        # Calculate the rolling percentile of each day's VIX value over the current lookback period
-        vix_data["Rolling Percentile"] = (
-            vix_data["value"]
-            .rolling(window=LOOKBACK_DAYS)
-            .apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100)
+
+from vixlib.cache import ResultCache
+from vixlib.cli import parse_outlier_sigma, parse_range
+from vixlib.metrics import RISK_METRICS
+from vixlib.percentile import expanding_percentile_rank, rolling_percentile_matrix
+from vixlib.store import load_series
+from vixlib.sweep import (
+    RANKING_METRICS,
+    adaptive_sweep,
+    candidate_metrics,
+    grid_sweep,
+    hysteresis_sweep,
+    walk_forward,
+    walk_forward_folds,
+    walk_forward_report,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Grid search VIX_THRESHOLD and LOOKBACK_DAYS")
+    parser.add_argument(
+        "--thresholds", type=int, nargs="+", default=[30, 51, 1], metavar="N",
+        help="VIX_THRESHOLD range as START STOP [STEP] (default: 30 51 1)",
+    )
+    parser.add_argument(
+        "--lookbacks", type=int, nargs="+", default=[5, 20, 1], metavar="N",
+        help="LOOKBACK_DAYS range as START STOP [STEP] (default: 5 20 1)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="number of worker processes (default: all CPUs, 1 runs in-process)",
+    )
+    parser.add_argument(
+        "--rank-by", choices=RANKING_METRICS, default="total_return",
+        help="metric used to pick the best parameters (default: total_return)",
+    )
+    parser.add_argument(
+        "--search", choices=("grid", "halving"), default="grid",
+        help="evaluate every cell, or use successive halving: score the grid on a subsample of the "
+        "history and keep only the best third for each finer pass (default: grid)",
+    )
+    parser.add_argument(
+        "--outlier-sigmas", type=parse_outlier_sigma, nargs="+", metavar="SIGMA",
+        help="with --search halving, also search these outlier filters, in standard deviations or 'none' "
+        "(default: 3.0)",
+    )
+    parser.add_argument(
+        "--exit-offsets", type=int, nargs="+", metavar="N",
+        help="also sweep (or search, with --search halving) exit thresholds this many points above the "
+        "entry threshold (hysteresis bands)",
+    )
+    parser.add_argument(
+        "--min-holds", type=int, nargs="+", metavar="DAYS",
+        help="also sweep (or search) minimum holding periods, in trading days",
+    )
+    parser.add_argument(
+        "--cooldowns", type=int, nargs="+", metavar="DAYS",
+        help="also sweep (or search) cooldowns after an exit, in trading days",
+    )
+    parser.add_argument(
+        "--walk-forward", type=int, nargs=2, metavar=("TRAIN", "TEST"),
+        help="re-optimize on each TRAIN trading days and trade the next TEST days out of sample, "
+        "e.g. 504 63 for two years / one quarter",
+    )
+    parser.add_argument(
+        "--anchored", action="store_true",
+        help="with --walk-forward, train on all the history before each test window",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="recompute every result instead of reusing the ones stored in the result cache",
+    )
+    args = parser.parse_args()
+    try:
+        args.thresholds = parse_range(args.thresholds)
+        args.lookbacks = parse_range(args.lookbacks)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if args.walk_forward and (args.walk_forward[0] < 2 or args.walk_forward[1] < 1):
+        parser.error("--walk-forward needs TRAIN >= 2 and TEST >= 1")
+    if args.outlier_sigmas and args.search != "halving":
+        parser.error("--outlier-sigmas needs --search halving")
+    return args
+
+
+def main():
+    args = parse_args()
+    cache = None if args.no_cache else ResultCache()
+
+    # Load VIX and S&P 500 data from the local store (refresh it with fred_sync.py)
+    vix_data = load_series("VIXCLS")
+    sp500_data = load_series("SP500")
+
+    # Everything below the grid loops is independent of the parameters, so compute it once:
+    # the point-in-time percentile of each day's VIX value over all the data up to that day ...
+    overall_percentile = expanding_percentile_rank(vix_data["value"].to_numpy())
+
+    # ... the rolling percentile for every lookback, falling back to the point-in-time percentile
+    rolling_percentiles = rolling_percentile_matrix(vix_data["value"], args.lookbacks)
+    rolling_percentiles = np.where(
+        np.isnan(rolling_percentiles), overall_percentile[:, None], rolling_percentiles
+    )
+
+    # ... and the alignment of the two datasets on their dates
+    percentile_frame = pd.DataFrame(rolling_percentiles, index=vix_data.index)
+    aligned_data = pd.concat([sp500_data["value"], percentile_frame], axis=1).dropna()
+    prices = aligned_data["value"].to_numpy()
+    percentiles = aligned_data.drop(columns="value").to_numpy()
+
+    if args.walk_forward:
+        folds = walk_forward_folds(len(prices), *args.walk_forward, anchored=args.anchored)
+        result = walk_forward(
+            prices, percentiles, args.thresholds, folds, rank_by=args.rank_by, workers=args.workers,
+            cache=cache,
         )
-        vix_data["Rolling Percentile"].fillna(vix_data["Percentile"], inplace=True)
-
-        # Align the two datasets on their dates
-        aligned_data = pd.concat([sp500_data, vix_data["Rolling Percentile"]], axis=1).dropna()
-
-        # Filter out data where VIX is below the VIX_THRESHOLD
-        blue_dot_data = aligned_data[aligned_data["Rolling Percentile"] < VIX_THRESHOLD].copy()
-
-        # Calculate daily returns and filter out extreme outliers
-        blue_dot_data["Daily Returns"] = blue_dot_data["value"].pct_change()
-        threshold = 3 * blue_dot_data["Daily Returns"].std()
-        blue_dot_data = blue_dot_data[
-            (blue_dot_data["Daily Returns"] < threshold)
-            & (blue_dot_data["Daily Returns"] > -threshold)
-        ]
-
-        # Calculate cumulative returns for the Long strategy
-        if not blue_dot_data.empty:
-            cumulative_blue_dot_returns = (blue_dot_data["Daily Returns"] + 1).cumprod() - 1
-            blue_dot_return = cumulative_blue_dot_returns.iloc[-1] * 100
-            print(f"VIX_THRESHOLD: {VIX_THRESHOLD} - LOOKBACK_DAYS: {LOOKBACK_DAYS} - Cumulative Return: {blue_dot_return:.2f}%")
-            print(f"BEST VIX_THRESHOLD: {best_vix_threshold} - LOOKBACK_DAYS: {best_lookback_days} - Cumulative Return: {best_return:.2f}%")
-
-            # Check if this is the best return so far
-            if blue_dot_return > best_return:
-                best_return = blue_dot_return
+        print(walk_forward_report(result, aligned_data.index.date, args.lookbacks).to_string(index=False))
+        print(f"Out-of-sample Cumulative Return: {result.total_return:.2f}%")
+        if result.metrics is not None:
+            print(f"Out-of-sample Sharpe: {result.metrics['sharpe']:.2f}")
+            print(f"Out-of-sample Max Drawdown: {result.metrics['max_drawdown']:.2f}%")
+        print(f"Buy and Hold Return over the same period: {result.buy_and_hold_return:.2f}%")
+        return
+
+    if args.search == "halving":
+        search = adaptive_sweep(
+            prices, percentiles, args.thresholds, args.outlier_sigmas or [3.0],
+            args.exit_offsets or [0], args.min_holds or [0], args.cooldowns or [0], rank_by=args.rank_by,
+        )
+        saved = (1 - search.cost / search.grid_size) * 100
+        print(
+            f"Successive halving: {search.evaluations} evaluations ({search.cost:.1f} on the full history) "
+            f"instead of {search.grid_size}, {saved:.1f}% saved"
+        )
+        if search.best is None:
+            print("No parameters traded")
+            return
+        column, threshold, outlier_sigma, exit_offset, min_hold, cooldown = search.best
+        metrics = candidate_metrics(prices, percentiles, [search.best])
+        print(f"Best VIX_THRESHOLD: {threshold}")
+        print(f"Best LOOKBACK_DAYS: {list(args.lookbacks)[column]}")
+        print(f"Best outlier filter: {'none' if outlier_sigma is None else outlier_sigma}")
+        print(f"Best exit threshold: {threshold + exit_offset}")
+        print(f"Best minimum hold: {min_hold}")
+        print(f"Best cooldown: {cooldown}")
+        for name in RISK_METRICS:
+            print(f"{name}: {metrics[name][0]:.2f}")
+        return
+
+    if args.exit_offsets or args.min_holds or args.cooldowns:
+        table = hysteresis_sweep(
+            prices, percentiles, args.thresholds,
+            args.exit_offsets or [0], args.min_holds or [0], args.cooldowns or [0],
+        )
+        table.insert(0, "lookback", np.asarray(args.lookbacks)[table.pop("lookback_column")])
+        table = table.dropna(subset=["total_return"]).sort_values(args.rank_by, ascending=False)
+        print(f"Top 10 of {len(table)} combinations by {args.rank_by}:")
+        print(table.head(10).to_string(index=False, float_format="{:.2f}".format))
+        return
+
+    grid = grid_sweep(prices, percentiles, args.thresholds, workers=args.workers, cache=cache)
+
+    best_score = -float("inf")  # Initialize best score to a very low value
+    best_vix_threshold = None
+    best_lookback_days = None
+
+    for column, LOOKBACK_DAYS in enumerate(args.lookbacks):
+        for row, VIX_THRESHOLD in enumerate(args.thresholds):
+            blue_dot_return = grid["total_return"][column, row]
+            if np.isnan(blue_dot_return):
+                continue
+            print(
+                f"VIX_THRESHOLD: {VIX_THRESHOLD} - LOOKBACK_DAYS: {LOOKBACK_DAYS} - Cumulative Return: {blue_dot_return:.2f}%"
+                f" - Sharpe: {grid['sharpe'][column, row]:.2f} - Max Drawdown: {grid['max_drawdown'][column, row]:.2f}%"
+            )
+
+            # Check if this is the best score so far
+            score = grid[args.rank_by][column, row]
+            if score > best_score:
+                best_score = score
                 best_vix_threshold = VIX_THRESHOLD
                 best_lookback_days = LOOKBACK_DAYS
 
-# Print the best VIX_THRESHOLD, LOOKBACK_DAYS, and cumulative return found
-print(f"Best VIX_THRESHOLD: {best_vix_threshold}")
-print(f"Best LOOKBACK_DAYS: {best_lookback_days}")
-print(f"Highest Cumulative Return: {best_return:.2f}%")
+    # Print the best VIX_THRESHOLD, LOOKBACK_DAYS and their metrics
+    print(f"Best VIX_THRESHOLD: {best_vix_threshold}")
+    print(f"Best LOOKBACK_DAYS: {best_lookback_days}")
+    if best_vix_threshold is not None:
+        column = list(args.lookbacks).index(best_lookback_days)
+        row = list(args.thresholds).index(best_vix_threshold)
+        print(f"Cumulative Return: {grid['total_return'][column, row]:.2f}%")
+        print(f"CAGR: {grid['cagr'][column, row]:.2f}%")
+        print(f"Sharpe: {grid['sharpe'][column, row]:.2f}")
+        print(f"Sortino: {grid['sortino'][column, row]:.2f}")
+        print(f"Max Drawdown: {grid['max_drawdown'][column, row]:.2f}%")
+        print(f"Calmar: {grid['calmar'][column, row]:.2f}")
+        print(f"Time in Market: {grid['time_in_market'][column, row]:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,7 @@
 import numpy as np
-from scipy.stats import norm
 import matplotlib.pyplot as plt
 
-# Black-Scholes formula for put option price
-def black_scholes_put(S, K, T, r, sigma):
-    if T <= 0:  # Gestione del caso di scadenza (T=0)
-        return max(K - S, 0)  # Valore intrinseco a scadenza
-    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
-    put_price = K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
-    return put_price
-
-# Function to calculate strike price for a given delta
-def strike_from_delta(S, T, r, sigma, delta):
-    if T <= 0:  # Gestione del caso di scadenza (T=0)
-        return S  # A scadenza, lo strike per qualsiasi delta è il prezzo spot
-    d1 = norm.ppf(delta) + sigma * np.sqrt(T)
-    K = S * np.exp(-d1 * sigma * np.sqrt(T) + (r + 0.5 * sigma ** 2) * T)
-    return K
-
-# Calcolo del theta (derivata rispetto al tempo)
-def black_scholes_theta_put(S, K, T, r, sigma):
-    if T <= 0:  # Gestione del caso di scadenza (T=0)
-        return 0  # Il theta a scadenza è 0
-    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
-    theta = -S * norm.pdf(d1) * sigma / (2 * np.sqrt(T)) - r * K * np.exp(-r * T) * norm.cdf(-d2)
-    return theta / 365  # Theta giornaliero
+from vixlib.black_scholes import black_scholes_put, greeks, strike_from_delta
 
 # Parameters
 S = 5600  # Current price of SP500
@@ -40,19 +15,22 @@ def adjusted_volatility(price_change_percent, base_volatility=sigma, sensitivity
     Calculate adjusted volatility based on price change.
     When price decreases, volatility increases more than proportionally.
     When price increases, volatility decreases more than proportionally.
+    Works element-wise on arrays of price changes.
     
     Args:
         price_change_percent: Percentage change in price (-20 means 20% decrease)
         base_volatility: Starting volatility level
         sensitivity: How sensitive volatility is to price changes
     """
+    change = np.asarray(price_change_percent, dtype=float) / 100
     # More than proportional relationship with inverse correlation
-    if price_change_percent < 0:
+    return np.where(
+        change < 0,
         # Price decrease -> volatility increase
-        return base_volatility * (1 - (price_change_percent / 100) * sensitivity)
-    else:
+        base_volatility * (1 - change * sensitivity),
         # Price increase -> volatility decrease
-        return max(0.05, base_volatility * (1 / (1 + (price_change_percent / 100) * sensitivity)))
+        np.maximum(0.05, base_volatility / (1 + np.maximum(change, 0) * sensitivity)),
+    )[()]
 
 # Time to maturity (in years) for the specified number of days, includendo la scadenza (T=0)
 # Creating a non-linear distribution to better visualize the time decay effect
@@ -70,16 +48,16 @@ days_to_maturity = np.concatenate([
 
 # Calculate put prices for different times to maturity
 # Invece di usare uno strike fisso, calcola anche lo strike per il delta 50
-K_delta_50 = [strike_from_delta(S, t, r, sigma, 1 - 0.5) for t in T_values]
-put_prices = [black_scholes_put(S, k, t, r, sigma) for k, t in zip(K_delta_50, T_values)]
+K_delta_50 = strike_from_delta(S, T_values, r, sigma, 1 - 0.5)
+put_prices = black_scholes_put(S, K_delta_50, T_values, r, sigma)
 
 # Calculate strike price for delta 25
-K_delta_25 = [strike_from_delta(S, t, r, sigma, 1 - 0.25) for t in T_values]
-put_prices_delta_25 = [black_scholes_put(S, k, t, r, sigma) for k, t in zip(K_delta_25, T_values)]
+K_delta_25 = strike_from_delta(S, T_values, r, sigma, 1 - 0.25)
+put_prices_delta_25 = black_scholes_put(S, K_delta_25, T_values, r, sigma)
 
 # Calculate strike price for delta 75
-K_delta_75 = [strike_from_delta(S, t, r, sigma, 1 - 0.75) for t in T_values]
-put_prices_delta_75 = [black_scholes_put(S, k, t, r, sigma) for k, t in zip(K_delta_75, T_values)]
+K_delta_75 = strike_from_delta(S, T_values, r, sigma, 1 - 0.75)
+put_prices_delta_75 = black_scholes_put(S, K_delta_75, T_values, r, sigma)
 
 # Plotting the results
 plt.figure(figsize=(12, 8))
@@ -120,16 +98,10 @@ for days_idx, days_to_exp in enumerate(reference_days):
     # Use the delta 50 strike for this time to maturity
     strike = K_delta_50[closest_idx]
     
-    # Calculate option prices for different price changes and their corresponding volatilities
-    adjusted_prices = []
-    for pct_change in price_changes:
-        # Calculate new price and adjusted volatility
-        new_price = S * (1 + pct_change/100)
-        new_vol = adjusted_volatility(pct_change)
-        
-        # Calculate option price with these parameters
-        put_price = black_scholes_put(new_price, strike, t_value, r, new_vol)
-        adjusted_prices.append(put_price)
+    # Calculate option prices for all the price changes and their corresponding volatilities at once
+    new_prices = S * (1 + price_changes/100)
+    new_vols = adjusted_volatility(price_changes)
+    adjusted_prices = black_scholes_put(new_prices, strike, t_value, r, new_vols)
     
     # Plot this time to maturity line
     plt.plot(price_changes, adjusted_prices, 
@@ -137,8 +109,7 @@ for days_idx, days_to_exp in enumerate(reference_days):
              linewidth=2)
     
     # Add annotations showing volatility at each point
-    for i, pct_change in enumerate(price_changes):
-        vol = adjusted_volatility(pct_change)
+    for i, vol in enumerate(new_vols):
         plt.annotate(f"σ:{vol:.2f}", 
                     (price_changes[i], adjusted_prices[i]),
                     textcoords="offset points", 
@@ -157,7 +128,7 @@ plt.show()
 
 # Create a second figure showing the relationship between price change and volatility
 plt.figure(figsize=(10, 6))
-vol_changes = [adjusted_volatility(pc) for pc in np.linspace(-30, 30, 100)]
+vol_changes = adjusted_volatility(np.linspace(-30, 30, 100))
 plt.plot(np.linspace(-30, 30, 100), vol_changes, 'r-', linewidth=2)
 plt.axvline(x=0, color='gray', linestyle='--', alpha=0.7)
 plt.axhline(y=sigma, color='gray', linestyle='--', alpha=0.7)
@@ -181,24 +152,14 @@ delta_values = np.linspace(0.1, 0.9, 20)  # From 0.1 to 0.9 delta
 
 # Create meshgrid for 3D surface
 X, Y = np.meshgrid(price_changes_grid, delta_values)
-Z = np.zeros_like(X)
 
 # Choose a reference time to maturity (e.g., 30 days)
 ref_dte = 180
 closest_idx = np.abs(days_to_maturity - ref_dte).argmin()
 t_value = T_values[closest_idx]
 
-# Fill Z matrix with volatility values
-for i, pc in enumerate(price_changes_grid):
-    for j, delta_val in enumerate(delta_values):
-        # Calculate volatility based on price change
-        vol = adjusted_volatility(pc)
-        
-        # For each delta, calculate corresponding strike
-        strike = strike_from_delta(S, t_value, r, vol, 1 - delta_val)
-        
-        # Store the volatility value
-        Z[j, i] = vol
+# Volatility surface: the adjusted volatility of each price change, the same for every delta
+Z = adjusted_volatility(X)
 
 # Create the 3D surface plot
 surf = ax.plot_surface(X, Y, Z, cmap='viridis', alpha=0.8,
@@ -227,24 +188,16 @@ plt.show()
 fig = plt.figure(figsize=(14, 10))
 ax = fig.add_subplot(111, projection='3d')
 
-# Matrice per i prezzi delle opzioni
-option_prices = np.zeros_like(X)
-
-# Fill option_prices matrix
-for i, pc in enumerate(price_changes_grid):
-    for j, delta_val in enumerate(delta_values):
-        # Calculate new price of underlying
-        new_price = S * (1 + pc/100)
-        
-        # Calculate adjusted volatility based on price change
-        vol = adjusted_volatility(pc)
-        
-        # Calculate strike for this delta
-        strike = strike_from_delta(S, t_value, r, sigma, 1 - delta_val)
-        
-        # Calculate option price
-        put_price = black_scholes_put(new_price, strike, t_value, r, vol)
-        option_prices[j, i] = put_price
+# Matrice per i prezzi delle opzioni, calcolata in un'unica chiamata sulla griglia:
+# nuovo prezzo del sottostante e volatilità aggiustata per ogni variazione di prezzo,
+# strike per ogni delta con la volatilità originale
+option_prices = black_scholes_put(
+    S * (1 + X/100),
+    strike_from_delta(S, t_value, r, sigma, 1 - Y),
+    t_value,
+    r,
+    adjusted_volatility(X),
+)
 
 # Create the option price surface plot
 surf = ax.plot_surface(X, Y, option_prices, cmap='plasma', alpha=0.8,
@@ -283,34 +236,18 @@ new_price = S * (1 + price_change_pct/100)
 # Calcolo della nuova volatilità (ridotta per aumento del prezzo)
 new_vol = adjusted_volatility(price_change_pct)
 
-# Vettori per i risultati
-strike_prices = []
-initial_put_prices = []
-new_put_prices = []
-price_changes = []
-put_deltas = []
-
-# Per ogni delta, calcola il cambiamento nel prezzo dell'opzione
-for delta_val in detailed_delta_values:
-    # Strike per questo delta con volatilità originale
-    strike = strike_from_delta(S, t_value, r, sigma, 1 - delta_val)
-    
-    # Prezzo iniziale dell'opzione
-    initial_put_price = black_scholes_put(S, strike, t_value, r, sigma)
-    
-    # Prezzo dell'opzione dopo la variazione
-    new_put_price = black_scholes_put(new_price, strike, t_value, r, new_vol)
-    
-    # Delta dell'opzione nel nuovo scenario
-    d1 = (np.log(new_price / strike) + (r + 0.5 * new_vol ** 2) * t_value) / (new_vol * np.sqrt(t_value))
-    put_delta = -norm.cdf(-d1)
-    
-    # Salva i risultati
-    strike_prices.append(strike)
-    initial_put_prices.append(initial_put_price)
-    new_put_prices.append(new_put_price)
-    price_changes.append(initial_put_price - new_put_price)
-    put_deltas.append(put_delta)
+# Per ogni delta, calcola il cambiamento nel prezzo dell'opzione (tutti i delta insieme)
+# Strike per ogni delta con volatilità originale
+strike_prices = strike_from_delta(S, t_value, r, sigma, 1 - detailed_delta_values)
+
+# Prezzo iniziale dell'opzione
+initial_put_prices = black_scholes_put(S, strike_prices, t_value, r, sigma)
+
+# Prezzo e delta dell'opzione nel nuovo scenario, dalle stesse d1/d2
+new_greeks = greeks(new_price, strike_prices, t_value, r, new_vol)
+new_put_prices = new_greeks["price"]
+put_deltas = new_greeks["delta"]
+price_changes = initial_put_prices - new_put_prices
 
 # Trova l'indice del delta con la minima diminuzione del valore dell'opzione
 min_decrease_index = np.argmin(price_changes)
@@ -366,36 +303,22 @@ closest_idx = np.abs(days_to_maturity - ref_dte).argmin()
 t_value = T_values[closest_idx]
 price_change_pct = 10
 
-# Vettori per i risultati
-strike_prices = []
-initial_extrinsic = []
-new_extrinsic = []
-extrinsic_changes = []
+# Per ogni delta, calcola il cambiamento nel valore estrinseco (tutti i delta insieme)
+# Strike per ogni delta con volatilità originale
+strike_prices = strike_from_delta(S, t_value, r, sigma, 1 - detailed_delta_values)
 
-# Per ogni delta, calcola il cambiamento nel valore estrinseco
-for delta_val in detailed_delta_values:
-    # Strike per questo delta con volatilità originale
-    strike = strike_from_delta(S, t_value, r, sigma, 1 - delta_val)
-    
-    # Prezzo iniziale dell'opzione e valore intrinseco
-    initial_put_price = black_scholes_put(S, strike, t_value, r, sigma)
-    initial_intrinsic = max(0, strike - S)
-    initial_ext = initial_put_price - initial_intrinsic
-    
-    # Nuovo prezzo e volatilità dopo il movimento del 10%
-    new_price = S * (1 + price_change_pct/100)
-    new_vol = adjusted_volatility(price_change_pct)
-    
-    # Nuovo prezzo dell'opzione e valore intrinseco
-    new_put_price = black_scholes_put(new_price, strike, t_value, r, new_vol)
-    new_intrinsic = max(0, strike - new_price)
-    new_ext = new_put_price - new_intrinsic
-    
-    # Salva i risultati
-    strike_prices.append(strike)
-    initial_extrinsic.append(initial_ext)
-    new_extrinsic.append(new_ext)
-    extrinsic_changes.append(new_ext - initial_ext)
+# Prezzo iniziale dell'opzione e valore intrinseco
+initial_put_prices = black_scholes_put(S, strike_prices, t_value, r, sigma)
+initial_extrinsic = initial_put_prices - np.maximum(0, strike_prices - S)
+
+# Nuovo prezzo e volatilità dopo il movimento del 10%
+new_price = S * (1 + price_change_pct/100)
+new_vol = adjusted_volatility(price_change_pct)
+
+# Nuovo prezzo dell'opzione e valore intrinseco
+new_put_prices = black_scholes_put(new_price, strike_prices, t_value, r, new_vol)
+new_extrinsic = new_put_prices - np.maximum(0, strike_prices - new_price)
+extrinsic_changes = new_extrinsic - initial_extrinsic
 
 # Creazione del grafico
 plt.figure(figsize=(15, 10))
@@ -1,58 +1,90 @@
-import json
-from fredapi import Fred
-import matplotlib.pyplot as plt
+import argparse
+import os
+
+import numpy as np
+
+from vixlib.cli import add_output_arguments, output_figures
+from vixlib.percentile import RollingPercentileState, rolling_percentile_rank
+from vixlib.plotting import line_chart
+from vixlib.store import load_arrays, load_series
 
 # Global Variables
-CONFIG_PATH = "config.json"
 LOOKBACK_PERIOD = 20
 PERCENTILE_THRESHOLD = 50  # The user can adjust this value
-
-# Load API keys from JSON file
-with open(CONFIG_PATH, "r") as file:
-    config = json.load(file)
-    FRED_API_KEY = config["fred_api_key"]
-
-fred = Fred(api_key=FRED_API_KEY)
+# Rolling window state kept between --latest runs
+STATE_PATH = os.path.join("data", "vix_percentile_state.json")
 
 def fetch_vix_data():
-    return fred.get_series("VIXCLS")
+    # Read from the local store (refresh it with fred_sync.py)
+    return load_series("VIXCLS")["value"]
 
 def calculate_vix_percentile(vix_data):
     # Fill gaps using interpolation
     vix_data_filled = vix_data.interpolate(method="linear")
     # Calculate the percentile of each day's VIX value over a rolling window
-    return vix_data_filled.rolling(window=LOOKBACK_PERIOD).apply(
-        lambda x: (x.rank(pct=True).iloc[-1]) * 100
-    )
+    return rolling_percentile_rank(vix_data_filled, LOOKBACK_PERIOD)
 
-def plot_vix_percentile(vix_percentile):
-    plt.figure(figsize=(14, 7))
-    plt.plot(vix_percentile, label=f"VIX {LOOKBACK_PERIOD}-Day Percentile")
-    plt.title(f"VIX {LOOKBACK_PERIOD}-Day Percentile")
-    plt.xlabel("Date")
-    plt.ylabel("Percentile")
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
+def latest_vix_percentile():
+    # Resume from the saved window and feed it only the observations it has not seen yet
+    state = None
+    if os.path.exists(STATE_PATH):
+        state = RollingPercentileState.load(STATE_PATH)
+    if state is None or state.window != LOOKBACK_PERIOD:
+        state = RollingPercentileState(LOOKBACK_PERIOD)
 
+    dates, values = load_arrays("VIXCLS")
+    # Replay the whole history if an observation behind the saved window was revised since
+    if not state.matches(dates, values):
+        state = RollingPercentileState(LOOKBACK_PERIOD)
+    start = 0 if state.last_date is None else np.searchsorted(dates, state.last_date, side="right")
+    for date, value in zip(dates[start:].tolist(), values[start:].tolist()):
+        state.update(value, date)
+
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    state.save(STATE_PATH)
+    return np.datetime64(state.last_date, "D"), state.percentile
+
+def vix_percentile_chart(vix_percentile):
     # Annotate the percentage of time VIX percentile is below PERCENTILE_THRESHOLD
     below_threshold_percent = (
         (vix_percentile < PERCENTILE_THRESHOLD).sum() / len(vix_percentile) * 100
     )
-    plt.annotate(
-        f"{below_threshold_percent:.2f}% of the time, the VIX Percentile is below {PERCENTILE_THRESHOLD}% with a lookback period of {LOOKBACK_PERIOD} trading days.",
-        (0.05, 0.05),
-        xycoords="axes fraction",
-        fontsize=14,
-        color="black",
-        bbox=dict(
-            boxstyle="round,pad=0.3", facecolor="white", edgecolor="black"
-        ),  # Background box with padding and white color
+    return dict(
+        x=vix_percentile.index,
+        y=vix_percentile,
+        title=f"VIX {LOOKBACK_PERIOD}-Day Percentile",
+        xlabel="Date",
+        ylabel="Percentile",
+        label=f"VIX {LOOKBACK_PERIOD}-Day Percentile",
+        annotations=[
+            dict(
+                text=f"{below_threshold_percent:.2f}% of the time, the VIX Percentile is below {PERCENTILE_THRESHOLD}% with a lookback period of {LOOKBACK_PERIOD} trading days.",
+                xy=(0.05, 0.05),
+                fontsize=14,
+                color="black",
+                bbox=dict(
+                    boxstyle="round,pad=0.3", facecolor="white", edgecolor="black"
+                ),  # Background box with padding and white color
+            )
+        ],
     )
 
-    plt.show()
-
 if __name__ == "__main__":
-    vix_data = fetch_vix_data()
-    vix_percentile = calculate_vix_percentile(vix_data)
-    plot_vix_percentile(vix_percentile)
+    parser = argparse.ArgumentParser(description="Observe the rolling VIX percentile")
+    parser.add_argument(
+        "--latest", action="store_true",
+        help="print today's percentile and position instead of plotting the full history",
+    )
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    if args.latest:
+        last_date, last_percentile = latest_vix_percentile()
+        risk_state = "Risk On" if last_percentile < PERCENTILE_THRESHOLD else "Risk Off"
+        print(f"Date: {last_date}")
+        print(f"VIX {LOOKBACK_PERIOD}-Day Percentile: {last_percentile:.2f}")
+        print(f"Position: {risk_state}")
+    else:
+        vix_data = fetch_vix_data()
+        vix_percentile = calculate_vix_percentile(vix_data)
+        output_figures(args, [("vix_percentile", line_chart, vix_percentile_chart(vix_percentile))])
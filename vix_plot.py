@@ -1,25 +1,22 @@
-import json
-from fredapi import Fred
-import matplotlib.pyplot as plt
+import argparse
 
-# Load API keys from JSON file
-with open("config.json", "r") as file:
-    config = json.load(file)
-    fred_api_key = config["fred_api_key"]
+from vixlib.cli import add_output_arguments, output_figures
+from vixlib.plotting import line_chart
+from vixlib.store import load_series
 
-# Set up FRED API Key
-fred = Fred(api_key=fred_api_key)
 
-# Fetch VIX data from FRED
-vix_data = fred.get_series("VIXCLS")
+def main():
+    parser = argparse.ArgumentParser(description="Plot the VIX index")
+    add_output_arguments(parser)
+    args = parser.parse_args()
 
-# Plotting the data
-plt.figure(figsize=(14, 7))
-plt.plot(vix_data, label="VIX")
-plt.title("VIX Index")
-plt.xlabel("Date")
-plt.ylabel("VIX Value")
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
+    # Load VIX data from the local store (refresh it with fred_sync.py)
+    vix_data = load_series("VIXCLS")["value"]
+
+    # Plotting the data
+    chart = dict(x=vix_data.index, y=vix_data, title="VIX Index", xlabel="Date", ylabel="VIX Value", label="VIX")
+    output_figures(args, [("vix", line_chart, chart)])
+
+
+if __name__ == "__main__":
+    main()
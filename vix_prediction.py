@@ -1,28 +1,17 @@
-import pandas as pd
 import numpy as np
 from sklearn.linear_model import Ridge
 from sklearn.model_selection import train_test_split
-import json
+
+from vixlib.store import load_json_series
 
 # Carica i dati storici di SP500 e VIX
 def load_data():
-    with open('VIXCLS.json', 'r') as f:
-        vix_data = json.load(f)
-    
-    vix_df = pd.DataFrame(vix_data)
-    vix_df['date'] = pd.to_datetime(vix_df['date'])
-    vix_df['value'] = pd.to_numeric(vix_df['value'], errors='coerce')  # Converti i valori in numerici, sostituendo i non numerici con NaN
+    # Lo snapshot binario viene rigenerato solo quando il JSON è più recente
+    vix_df = load_json_series('VIXCLS.json')
     vix_df.dropna(inplace=True)  # Rimuovi le righe con valori NaN
-    vix_df.set_index('date', inplace=True)
-    
-    with open('SP500.json', 'r') as f:
-        sp500_data = json.load(f)
-    
-    sp500_df = pd.DataFrame(sp500_data)
-    sp500_df['date'] = pd.to_datetime(sp500_df['date'])
-    sp500_df['value'] = pd.to_numeric(sp500_df['value'], errors='coerce')  # Converti i valori in numerici, sostituendo i non numerici con NaN
+
+    sp500_df = load_json_series('SP500.json')
     sp500_df.dropna(inplace=True)  # Rimuovi le righe con valori NaN
-    sp500_df.set_index('date', inplace=True)
     
     # Filtra le date comuni
     common_dates = sp500_df.index.intersection(vix_df.index)
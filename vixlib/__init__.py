@@ -0,0 +1,7 @@
+"""
+Shared helpers for the VIX percentile strategy scripts.
+
+Submodules only import numpy at load time. pandas, requests and matplotlib
+are imported inside the functions that need them, so a signal check that
+reads the tail of a series never pays for them.
+"""
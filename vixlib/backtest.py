@@ -0,0 +1,157 @@
+"""
+Vectorized signal -> position -> P/L engine shared by the strategy scripts.
+
+A strategy is a boolean signal per date (True = long). As in the original
+scripts, the return of an in-market day is measured from the previous
+in-market day, so out-of-market stretches are skipped rather than held flat.
+Returns beyond `outlier_sigma` standard deviations of a strategy's own
+returns are dropped before compounding; with no outlier filter the compounded
+return equals the P/L from the first to the last in-market price.
+
+`held_returns` is the flat-when-out alternative: only the daily moves made
+while a position from the previous close is held count, which is what
+volatility, drawdown and the other risk metrics have to be measured on.
+
+`hysteresis_signals` turns percentiles into signals with entry/exit bands,
+minimum holding periods and cooldowns; the scan runs over dates once and
+advances every parameter combination together.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+BacktestResult = namedtuple(
+    "BacktestResult",
+    [
+        "returns",  # (n_dates, n_strategies) return counted on each date, 0 when not counted
+        "equity",  # (n_dates, n_strategies) growth of 1 after each date
+        "traded",  # (n_dates, n_strategies) True where a return was counted
+        "in_market",  # (n_dates, n_strategies) the input signals
+        "total_return",  # (n_strategies,) cumulative return in %, NaN if there is nothing to compound
+        "trading_days",  # (n_strategies,) number of counted returns
+        "buy_and_hold_return",  # P/L in % from the first to the last price
+    ],
+)
+
+
+def run_backtest(prices, signals, outlier_sigma=3.0):
+    """
+    Backtest one or many long/flat signals against the same price series.
+
+    `prices` has shape (n_dates,) and `signals` either (n_dates,) or
+    (n_dates, n_strategies), aligned on the same dates. Every array in the
+    result keeps the shape of `signals` (per-strategy stats are scalars for a
+    1-D signal). Set `outlier_sigma` to None to keep every return.
+    """
+    prices = np.asarray(prices, dtype=float)
+    signals = np.asarray(signals, dtype=bool)
+    single = signals.ndim == 1
+    if single:
+        signals = signals[:, None]
+    n_dates = len(prices)
+
+    # Position of the previous in-market day for every date, -1 if there is none yet
+    positions = np.arange(n_dates)[:, None]
+    last_selected = np.maximum.accumulate(np.where(signals, positions, -1), axis=0)
+    previous = np.vstack([np.full((1, signals.shape[1]), -1), last_selected[:-1]])
+    has_previous = signals & (previous >= 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_returns = np.where(has_previous, prices[:, None] / prices[np.maximum(previous, 0)] - 1, np.nan)
+
+    traded = has_previous
+    if outlier_sigma is not None:
+        counts = has_previous.sum(axis=0)
+        means = np.nansum(raw_returns, axis=0) / np.maximum(counts, 1)
+        squares = np.nansum((raw_returns - means) ** 2, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+        limit = outlier_sigma * std
+        # Comparisons against a NaN limit are False, so strategies with < 2 returns count nothing
+        traded = has_previous & (raw_returns < limit) & (raw_returns > -limit)
+
+    returns = np.where(traded, raw_returns, 0.0)
+    equity = np.cumprod(returns + 1, axis=0)
+    trading_days = traded.sum(axis=0)
+    # Unfiltered, a single in-market day is a flat 0%; filtered, it has no return to survive the filter
+    has_result = trading_days > 0 if outlier_sigma is not None else signals.any(axis=0)
+    if n_dates:
+        total_return = np.where(has_result, (equity[-1] - 1) * 100, np.nan)
+        buy_and_hold_return = (prices[-1] - prices[0]) / prices[0] * 100
+    else:
+        total_return = np.full(signals.shape[1], np.nan)
+        buy_and_hold_return = np.nan
+
+    if single:
+        return BacktestResult(
+            returns[:, 0], equity[:, 0], traded[:, 0], signals[:, 0],
+            total_return[0], int(trading_days[0]), buy_and_hold_return,
+        )
+    return BacktestResult(returns, equity, traded, signals, total_return, trading_days, buy_and_hold_return)
+
+
+def held_returns(prices, signals):
+    """
+    Daily returns of trading each signal at the close it is computed on:
+    prices[t] / prices[t - 1] - 1 on the days after the signal is on, 0 on the
+    others and on the first date.
+
+    A signal built from day t's close can only earn the move from t to t + 1,
+    so positions are the signals lagged by one date. `signals` has shape
+    (n_dates,) or (n_dates, n_strategies) and the result keeps it. Unlike
+    `run_backtest`, a return never spans a flat stretch.
+    """
+    prices = np.asarray(prices, dtype=float)
+    signals = np.asarray(signals, dtype=bool)
+    positions = np.zeros_like(signals)
+    positions[1:] = signals[:-1]
+    daily = np.zeros(len(prices))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        daily[1:] = prices[1:] / prices[:-1] - 1
+    if signals.ndim > 1:
+        daily = daily[:, None]
+    return np.where(positions, daily, 0.0)
+
+
+def hysteresis_signals(percentiles, entry, exit=None, min_hold=0, cooldown=0):
+    """
+    Long/flat signals with separate entry and exit thresholds.
+
+    A flat strategy goes long on a day whose percentile is below `entry`, once
+    at least `cooldown` flat days have passed since its last exit. It stays
+    long until the percentile reaches `exit` (default: `entry`) and it has
+    been long for at least `min_hold` days. NaN percentiles neither enter nor
+    exit. With `exit=entry` and no hold or cooldown, on percentiles without
+    NaN, this is `percentiles < entry`.
+
+    `percentiles` has shape (n_dates,) or (n_dates, n_strategies); the
+    parameters are scalars or (n_strategies,) arrays and broadcast against its
+    columns. The loop runs over dates only, updating every strategy at once.
+    """
+    percentiles = np.asarray(percentiles, dtype=float)
+    entry = np.asarray(entry, dtype=float)
+    exit = entry if exit is None else np.asarray(exit, dtype=float)
+    min_hold = np.asarray(min_hold)
+    cooldown = np.asarray(cooldown)
+    single = percentiles.ndim == 1 and all(np.ndim(p) == 0 for p in (entry, exit, min_hold, cooldown))
+    if percentiles.ndim == 1:
+        percentiles = percentiles[:, None]
+    n_strategies = np.broadcast_shapes(
+        percentiles.shape[1:], entry.shape, exit.shape, min_hold.shape, cooldown.shape
+    )
+    percentiles = np.broadcast_to(percentiles, (len(percentiles),) + n_strategies)
+
+    signals = np.empty(percentiles.shape, dtype=bool)
+    in_market = np.zeros(n_strategies, dtype=bool)
+    held = np.zeros(n_strategies, dtype=np.int64)  # days long so far in the current position
+    # Flat days since the last exit; starts high so the first entry has no cooldown
+    since_exit = np.full(n_strategies, np.iinfo(np.int64).max // 2)
+    for t, percentile in enumerate(percentiles):
+        enter = ~in_market & (percentile < entry) & (since_exit >= cooldown)
+        leave = in_market & (percentile >= exit) & (held >= min_hold)
+        in_market = (in_market | enter) & ~leave
+        held = np.where(in_market, held + 1, 0)
+        since_exit = np.where(leave, 0, np.where(in_market, since_exit, since_exit + 1))
+        signals[t] = in_market
+
+    return signals[:, 0] if single else signals
@@ -0,0 +1,106 @@
+"""
+Black-Scholes pricing for European puts, vectorized.
+
+Every function broadcasts its arguments against each other, so a whole
+surface (e.g. price changes along one axis and deltas along the other) is one
+call. Expired options (T <= 0) are handled element-wise with `np.where`.
+Scalars in give scalars out. scipy is imported on first use.
+
+`greeks` returns the price and all first-order sensitivities (plus gamma) of
+every element from a single d1/d2 evaluation.
+"""
+import numpy as np
+
+# Fields of the structured array returned by `greeks`
+GREEKS_DTYPE = np.dtype([
+    ("price", float),
+    ("delta", float),
+    ("gamma", float),
+    ("vega", float),  # per 1.00 change in sigma
+    ("theta", float),  # per calendar day
+    ("rho", float),  # per 1.00 change in r
+])
+
+
+def _expiry_safe(T):
+    # Time to expiry with expired elements replaced by 1, so no division by zero is evaluated
+    T = np.asarray(T, dtype=float)
+    expired = T <= 0
+    return np.where(expired, 1.0, T), expired
+
+
+def _d1_d2(S, K, T, r, sigma):
+    sqrt_T = np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * sqrt_T)
+    return d1, d1 - sigma * sqrt_T
+
+
+def black_scholes_put(S, K, T, r, sigma):
+    """Put price; at expiry (T <= 0) the intrinsic value max(K - S, 0)."""
+    from scipy.special import ndtr
+
+    S, K, r, sigma = (np.asarray(a, dtype=float) for a in (S, K, r, sigma))
+    T_safe, expired = _expiry_safe(T)
+    d1, d2 = _d1_d2(S, K, T_safe, r, sigma)
+    price = K * np.exp(-r * T_safe) * ndtr(-d2) - S * ndtr(-d1)
+    return np.where(expired, np.maximum(K - S, 0), price)[()]
+
+
+def strike_from_delta(S, T, r, sigma, delta):
+    """Strike whose N(d1) equals `delta`; at expiry (T <= 0) the spot price."""
+    from scipy.special import ndtri
+
+    S, r, sigma, delta = (np.asarray(a, dtype=float) for a in (S, r, sigma, delta))
+    T_safe, expired = _expiry_safe(T)
+    sigma_sqrt_T = sigma * np.sqrt(T_safe)
+    d1 = ndtri(delta) + sigma_sqrt_T
+    strike = S * np.exp(-d1 * sigma_sqrt_T + (r + 0.5 * sigma ** 2) * T_safe)
+    return np.where(expired, S, strike)[()]
+
+
+def black_scholes_theta_put(S, K, T, r, sigma):
+    """Daily put theta (per calendar day); 0 at expiry (T <= 0)."""
+    return greeks(S, K, T, r, sigma)["theta"]
+
+
+def greeks(S, K, T, r, sigma, kind="put"):
+    """
+    Price, delta, gamma, vega, theta and rho of European puts or calls.
+
+    Arguments broadcast as in the other functions; the result is a structured
+    array of `GREEKS_DTYPE` with their broadcast shape. d1, d2, the normal
+    CDFs and the density are evaluated once per element and shared by every
+    field. At expiry (T <= 0) the price is the intrinsic value, delta is the
+    in-the-money indicator (-1/0 for puts, 1/0 for calls) and the rest is 0.
+    """
+    from scipy.special import ndtr
+
+    if kind not in ("put", "call"):
+        raise ValueError("kind must be 'put' or 'call'")
+    S, K, r, sigma = (np.asarray(a, dtype=float) for a in (S, K, r, sigma))
+    T_safe, expired = _expiry_safe(T)
+    S, K, T_safe, expired, r, sigma = np.broadcast_arrays(S, K, T_safe, expired, r, sigma)
+
+    sqrt_T = np.sqrt(T_safe)
+    d1, d2 = _d1_d2(S, K, T_safe, r, sigma)
+    pdf_d1 = np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi)
+    discounted_K = K * np.exp(-r * T_safe)
+    # Calls use N(d), puts N(-d) = 1 - N(d)
+    sign = 1.0 if kind == "call" else -1.0
+    cdf_d1 = ndtr(sign * d1)
+    cdf_d2 = ndtr(sign * d2)
+
+    price = sign * (S * cdf_d1 - discounted_K * cdf_d2)
+    delta = sign * cdf_d1
+    gamma = pdf_d1 / (S * sigma * sqrt_T)
+    vega = S * pdf_d1 * sqrt_T
+    theta = (-S * pdf_d1 * sigma / (2 * sqrt_T) - sign * r * discounted_K * cdf_d2) / 365
+    rho = sign * discounted_K * T_safe * cdf_d2
+
+    in_the_money = sign * (S - K) > 0
+    result = np.empty(S.shape, dtype=GREEKS_DTYPE)
+    result["price"] = np.where(expired, np.maximum(sign * (S - K), 0), price)
+    result["delta"] = np.where(expired, np.where(in_the_money, sign, 0.0), delta)
+    for name, value in (("gamma", gamma), ("vega", vega), ("theta", theta), ("rho", rho)):
+        result[name] = np.where(expired, 0.0, value)
+    return result[()]
@@ -0,0 +1,126 @@
+"""
+On-disk cache of backtest results, addressed by content.
+
+Entries are keyed by a hash of the exact input arrays and the parameters that
+produced them, so results computed on an unchanged slice of history stay
+valid after a new day is appended and entries for superseded data are simply
+never read again. They are stored as `.npz` blobs in a SQLite file and evicted
+least recently used first once the cache exceeds `MAX_CACHE_BYTES` or
+`MAX_CACHE_ENTRIES`. Reads only record recency in memory; it is written with
+the next store, on `close` or at exit.
+"""
+import atexit
+import hashlib
+import io
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+CACHE_PATH = os.path.join("data", "results_cache.sqlite")
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+MAX_CACHE_ENTRIES = 100_000
+
+
+def fingerprint(*arrays):
+    """SHA-256 of the dtype, shape and bytes of every array, in order."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def cache_key(kind, data_fingerprint, **params):
+    """Key of a result of `kind` computed on data with `data_fingerprint` using `params`."""
+    payload = json.dumps([kind, data_fingerprint, params], sort_keys=True, default=float)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed LRU cache mapping keys to dicts of numpy arrays."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_CACHE_ENTRIES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        # Recency counter and totals are read once, then kept in memory
+        self.clock, self.entries, self.total_bytes = self.connection.execute(
+            "SELECT COALESCE(MAX(last_used), 0), COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        # Recency of the entries read since the last flush, written in one transaction
+        self.touched = {}
+        atexit.register(self.flush)
+        self.hits = 0
+        self.misses = 0
+
+    def _tick(self):
+        # A counter instead of wall time keeps the LRU order exact
+        self.clock += 1
+        return self.clock
+
+    def get(self, key):
+        """The arrays stored under `key`, or None."""
+        row = self.connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched[key] = self._tick()
+        with np.load(io.BytesIO(row[0])) as stored:
+            return {name: stored[name] for name in stored.files}
+
+    def put(self, key, arrays):
+        """Store a dict of arrays under `key`, then evict down to the size limits."""
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        value = buffer.getvalue()
+        self.flush()
+        with self.connection:
+            replaced = self.connection.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if replaced is not None:
+                self.entries -= 1
+                self.total_bytes -= replaced[0]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, value, len(value), self._tick())
+            )
+            self.entries += 1
+            self.total_bytes += len(value)
+            if self.total_bytes > self.max_bytes or self.entries > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # Least recently used first, walking the last_used index until both limits hold
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if self.total_bytes <= self.max_bytes and self.entries <= self.max_entries:
+                break
+            evicted.append((key,))
+            self.entries -= 1
+            self.total_bytes -= size
+        self.connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def flush(self):
+        """Write the recency of the entries read since the last flush."""
+        if not self.touched:
+            return
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE results SET last_used = ? WHERE key = ?", [(tick, key) for key, tick in self.touched.items()]
+            )
+        self.touched.clear()
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+        self.connection.close()
@@ -0,0 +1,47 @@
+import argparse
+import os
+
+
+def parse_range(values):
+    """Turn a START STOP [STEP] list from the command line into a range."""
+    if len(values) not in (2, 3):
+        raise argparse.ArgumentTypeError("expected START STOP [STEP]")
+    return range(*values)
+
+
+def parse_outlier_sigma(text):
+    """An outlier filter from the command line: a number of standard deviations, or "none"."""
+    if text.lower() == "none":
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or 'none', got {text!r}")
+
+
+def add_output_arguments(parser):
+    """Options that switch a charting script from interactive windows to image files."""
+    parser.add_argument(
+        "--output-dir", metavar="DIR",
+        help="render the charts headless into DIR instead of opening windows",
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=("png", "svg", "pdf"), default=["png"],
+        help="image formats written with --output-dir (default: png)",
+    )
+    parser.add_argument(
+        "--render-workers", type=int, default=os.cpu_count() or 1,
+        help="processes rendering the charts with --output-dir (default: all CPUs)",
+    )
+
+
+def output_figures(args, jobs):
+    """Show the figure jobs, or render them to files if --output-dir was given."""
+    from vixlib.plotting import render_figures, show_figures
+
+    if args.output_dir is None:
+        show_figures(jobs)
+        return
+    for paths in render_figures(jobs, args.output_dir, args.formats, args.render_workers):
+        for path in paths:
+            print(f"Saved {path}")
@@ -0,0 +1,11 @@
+import json
+from functools import lru_cache
+
+CONFIG_PATH = "config.json"
+
+
+@lru_cache(maxsize=None)
+def load_config(path=CONFIG_PATH):
+    """API keys from config.json, read on first use instead of at import time."""
+    with open(path, "r") as file:
+        return json.load(file)
@@ -0,0 +1,48 @@
+"""
+Visual downsampling for long price histories.
+
+A chart a few thousand pixels wide cannot show more than a couple of points
+per pixel column, so series longer than a point budget are reduced to the
+minimum and maximum of each bucket of consecutive points. The extremes, and
+therefore the visible envelope of the line, are kept exactly.
+"""
+import numpy as np
+
+# Points kept per line: two per pixel column of a 14-inch figure at 100 dpi, with headroom
+DEFAULT_POINT_BUDGET = 4000
+
+
+def minmax_indices(values, n_buckets):
+    """
+    Positions of the minimum and maximum of each of `n_buckets` runs of
+    consecutive values, in order. NaN values are only kept in buckets that
+    have nothing else.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    buckets = np.arange(n) * n_buckets // n
+    # Sorted by bucket, then by value with NaN last
+    order = np.lexsort((values, buckets))
+    starts = np.searchsorted(buckets, np.arange(n_buckets))
+    valid = np.add.reduceat(~np.isnan(values[order]), starts)
+    lowest = order[starts]
+    highest = order[starts + np.maximum(valid - 1, 0)]
+    return np.unique(np.concatenate([lowest, highest]))
+
+
+def downsample_indices(values, max_points=DEFAULT_POINT_BUDGET, keep=()):
+    """
+    Positions to draw so that at most about `max_points` points remain.
+
+    Series within the budget are returned whole. Otherwise the first and last
+    points, the per-bucket extremes and every position in `keep` (e.g. regime
+    boundaries that must not move) are returned, sorted.
+    """
+    n = len(values)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    keep = np.asarray(keep, dtype=np.int64)
+    return np.unique(np.concatenate([[0, n - 1], minmax_indices(values, max(max_points // 2, 1)), keep]))
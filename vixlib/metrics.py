@@ -0,0 +1,74 @@
+"""
+Risk metrics for many strategies at once.
+
+Every function takes a (n_dates, n_strategies) matrix of per-date returns,
+as produced by `held_returns` (0 on days out of the market), and reduces each
+column in a handful of vectorized passes.
+"""
+import numpy as np
+
+PERIODS_PER_YEAR = 252
+
+# Metric names, in display order; ratios are plain numbers, everything else is in %
+RISK_METRICS = (
+    "total_return",
+    "cagr",
+    "volatility",
+    "sharpe",
+    "sortino",
+    "max_drawdown",
+    "calmar",
+    "time_in_market",
+)
+
+
+def risk_metrics(returns, in_market=None, periods_per_year=PERIODS_PER_YEAR):
+    """
+    CAGR, volatility, Sharpe, Sortino, max drawdown, Calmar and time in market
+    for every column of `returns`.
+
+    Returns a dict keyed by `RISK_METRICS` whose values have one entry per
+    column (scalars for 1-D input). `in_market` defaults to the days with a
+    non-zero return. Ratios use a zero risk-free rate.
+    """
+    returns = np.asarray(returns, dtype=float)
+    single = returns.ndim == 1
+    if single:
+        returns = returns[:, None]
+    if in_market is None:
+        in_market = returns != 0
+    in_market = np.asarray(in_market, dtype=bool).reshape(returns.shape)
+
+    n_dates = len(returns)
+    if n_dates < 2:
+        raise ValueError("risk metrics need at least two dates")
+    annualize = np.sqrt(periods_per_year)
+    equity = np.cumprod(returns + 1, axis=0)
+    final = equity[-1]
+    years = n_dates / periods_per_year
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = np.where(final > 0, final ** (1 / years) - 1, np.nan)
+        mean = returns.mean(axis=0)
+        std = returns.std(axis=0, ddof=1)
+        downside = np.sqrt((np.minimum(returns, 0) ** 2).mean(axis=0))
+        sharpe = np.where(std > 0, mean / std * annualize, np.nan)
+        sortino = np.where(downside > 0, mean / downside * annualize, np.nan)
+
+        # Max drawdown from the running peak of each equity curve
+        max_drawdown = (equity / np.maximum.accumulate(equity, axis=0) - 1).min(axis=0)
+        calmar = np.where(max_drawdown < 0, cagr / -max_drawdown, np.nan)
+
+    metrics = {
+        "total_return": (final - 1) * 100,
+        "cagr": cagr * 100,
+        "volatility": std * annualize * 100,
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "max_drawdown": max_drawdown * 100,
+        "calmar": calmar,
+        "time_in_market": in_market.mean(axis=0) * 100,
+    }
+    if single:
+        return {name: value[0] for name, value in metrics.items()}
+    return metrics
@@ -0,0 +1,238 @@
+import json
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+
+import numpy as np
+
+
+def _wrap_like(values, result):
+    # Give Series inputs a Series back on the same index, plain arrays otherwise;
+    # checked by module, since lists have an `index` method and pandas may not be loaded
+    if type(values).__module__.startswith("pandas"):
+        import pandas as pd
+
+        return pd.Series(result, index=values.index, name=getattr(values, "name", None))
+    return result
+
+
+def rolling_percentile_rank(values, window):
+    """
+    Percentile (0-100) of each value within the trailing `window` observations.
+
+    Matches `rolling(window).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100)`:
+    ties get the average rank and any window that contains a NaN yields NaN.
+    The window is kept sorted, so each step costs O(log w) comparisons.
+    """
+    data = np.asarray(values, dtype=float)
+    result = np.full(len(data), np.nan)
+    if window < 1:
+        raise ValueError("window must be a positive integer")
+
+    sorted_window = []
+    nan_count = 0
+    for i, value in enumerate(data):
+        if value != value:
+            nan_count += 1
+        else:
+            insort(sorted_window, value)
+
+        if i >= window:
+            old = data[i - window]
+            if old != old:
+                nan_count -= 1
+            else:
+                del sorted_window[bisect_left(sorted_window, old)]
+
+        if i >= window - 1 and nan_count == 0:
+            less = bisect_left(sorted_window, value)
+            equal = bisect_right(sorted_window, value) - less
+            result[i] = (less + (equal + 1) / 2) / window * 100
+
+    return _wrap_like(values, result)
+
+
+def rolling_percentile_matrix(values, lookbacks, chunk_size=2048):
+    """
+    Rolling percentile ranks for several lookbacks in one pass.
+
+    Returns a C-contiguous float64 array of shape (n_dates, len(lookbacks)) whose
+    column j equals `rolling_percentile_rank(values, lookbacks[j])`. Each date is
+    compared once against its longest window and the comparison counts are
+    accumulated by lag, so every shorter window reuses the same work.
+    """
+    data = np.asarray(values, dtype=float)
+    lookbacks = np.asarray(lookbacks, dtype=np.int64)
+    if lookbacks.ndim != 1 or len(lookbacks) == 0 or lookbacks.min() < 1:
+        raise ValueError("lookbacks must be a non-empty list of positive integers")
+
+    n = len(data)
+    max_lookback = int(lookbacks.max())
+    result = np.full((n, len(lookbacks)), np.nan)
+
+    # Pad the front so every date has a full (lag 0 .. max_lookback - 1) history row
+    padded = np.concatenate([np.full(max_lookback - 1, np.nan), data])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, max_lookback)[:, ::-1]
+    columns = lookbacks - 1
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        block = windows[start:stop]
+        current = block[:, :1]
+
+        less = np.cumsum(block < current, axis=1, dtype=np.int32)[:, columns]
+        equal = np.cumsum(block == current, axis=1, dtype=np.int32)[:, columns]
+        missing = np.cumsum(np.isnan(block), axis=1, dtype=np.int32)[:, columns]
+
+        ranks = (less + (equal + 1) / 2) / lookbacks * 100
+        result[start:stop] = np.where(missing == 0, ranks, np.nan)
+
+    return result
+
+
+def expanding_percentile_rank(values):
+    """
+    Point-in-time percentile (0-100) of each value among all values up to it.
+
+    The last row equals `rank(pct=True) * 100` over the whole series, but no
+    row sees later data. Values are discretized to their distinct levels and
+    counted in a Fenwick tree, so the n ranks cost O(n log n). NaNs stay NaN
+    and are not counted.
+    """
+    data = np.asarray(values, dtype=float)
+    result = np.full(len(data), np.nan)
+    valid = np.flatnonzero(~np.isnan(data))
+    levels, level_of = np.unique(data[valid], return_inverse=True)
+
+    size = len(levels)
+    tree = [0] * (size + 1)
+    level_counts = [0] * size
+    for seen, (position, level) in enumerate(zip(valid.tolist(), level_of.tolist()), start=1):
+        # Insert this observation
+        level_counts[level] += 1
+        node = level + 1
+        while node <= size:
+            tree[node] += 1
+            node += node & -node
+
+        # Count the observations on lower levels
+        less = 0
+        node = level
+        while node > 0:
+            less += tree[node]
+            node -= node & -node
+
+        result[position] = (less + (level_counts[level] + 1) / 2) / seen * 100
+
+    return _wrap_like(values, result)
+
+
+class RollingPercentileState:
+    """
+    Rolling percentile of the latest observation, updated one value at a time.
+
+    Holds the trailing window both in arrival order and sorted, so `update`
+    costs O(log w) comparisons. Missing values (NaN) are filled by linear
+    interpolation once the next valid value arrives, the same values
+    `Series.interpolate(method="linear")` produces for interior gaps; until
+    then the previous percentile is reported. The state round-trips through
+    `to_dict`/`from_dict` (or `save`/`load`) so it can persist between runs,
+    and keeps the raw observations its window was built from so `matches`
+    can tell when the source has revised one of them since.
+    """
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("window must be a positive integer")
+        self.window = window
+        self.values = deque()
+        self.sorted_values = []
+        self.last_valid = None
+        self.pending_gaps = 0
+        self.last_date = None
+        self.percentile = np.nan
+        # Raw (date, value) pairs of the latest observations, NaN included
+        self.observations = deque(maxlen=window)
+
+    def _push(self, value):
+        self.values.append(value)
+        insort(self.sorted_values, value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            del self.sorted_values[bisect_left(self.sorted_values, old)]
+
+    def update(self, value, date=None):
+        """Feed the next observation and return the updated percentile (0-100)."""
+        value = float(value)
+        self.observations.append((date, value))
+        if date is not None:
+            self.last_date = date
+        if value != value:
+            # A gap can only be filled once the value after it is known
+            if self.last_valid is not None:
+                self.pending_gaps += 1
+            return self.percentile
+
+        if self.pending_gaps:
+            step = (value - self.last_valid) / (self.pending_gaps + 1)
+            for i in range(1, self.pending_gaps + 1):
+                self._push(self.last_valid + step * i)
+            self.pending_gaps = 0
+        self._push(value)
+        self.last_valid = value
+
+        if len(self.values) == self.window:
+            less = bisect_left(self.sorted_values, value)
+            equal = bisect_right(self.sorted_values, value) - less
+            self.percentile = (less + (equal + 1) / 2) / self.window * 100
+        return self.percentile
+
+    def matches(self, dates, values):
+        """
+        Whether the latest observations fed up to `last_date` are still the
+        last ones of `dates`/`values` up to that date, unrevised.
+        """
+        if self.last_date is None:
+            return True
+        count = len(self.observations)
+        stop = int(np.searchsorted(dates, self.last_date, side="right"))
+        if count == 0 or stop < count:
+            return False
+        seen_dates, seen_values = zip(*self.observations)
+        return np.array_equal(dates[stop - count:stop], seen_dates) and np.array_equal(
+            np.asarray(values[stop - count:stop], dtype=float), seen_values, equal_nan=True
+        )
+
+    def to_dict(self):
+        return {
+            "window": self.window,
+            "values": list(self.values),
+            "last_valid": self.last_valid,
+            "pending_gaps": self.pending_gaps,
+            "last_date": self.last_date,
+            "percentile": None if np.isnan(self.percentile) else self.percentile,
+            "observations": [[date, None if np.isnan(value) else value] for date, value in self.observations],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data["window"])
+        state.values = deque(data["values"])
+        state.sorted_values = sorted(state.values)
+        state.last_valid = data["last_valid"]
+        state.pending_gaps = data["pending_gaps"]
+        state.last_date = data["last_date"]
+        state.percentile = np.nan if data["percentile"] is None else data["percentile"]
+        # States saved without observations never match, so they are rebuilt once
+        state.observations.extend(
+            (date, np.nan if value is None else value) for date, value in data.get("observations", [])
+        )
+        return state
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as file:
+            return cls.from_dict(json.load(file))
@@ -0,0 +1,143 @@
+"""
+Chart helpers shared by the strategy scripts.
+
+matplotlib is imported inside each function, so scripts that never draw
+don't pay for it. Figures are described as (name, builder, kwargs) jobs, where
+the builder is a module-level function here that returns a Figure: the same
+jobs are shown one after the other by `show_figures`, or rendered headless to
+image files by `render_figures`, in a process pool when there are several.
+"""
+import os
+
+import numpy as np
+
+from vixlib.downsample import DEFAULT_POINT_BUDGET, downsample_indices
+
+
+def plot_regimes(
+    ax, dates, prices, regimes, color="blue", base_color="red", markersize=1, max_points=DEFAULT_POINT_BUDGET
+):
+    """
+    Draw `prices` in `base_color` with the in-market runs of `regimes` (a
+    `vixlib.regimes.RegimeIndex` over the same dates) overlaid in `color`.
+
+    Each run is drawn up to the first flat date after it, the price the
+    position was closed at. The overlay is a single `LineCollection` of the
+    in-market steps plus one marker line, however many runs there are.
+    Above `max_points` dates the prices are downsampled to per-bucket extremes,
+    keeping the first and exit date of every run. Returns the collection.
+    """
+    import matplotlib.dates as mdates
+    from matplotlib.collections import LineCollection
+
+    x = mdates.date2num(np.asarray(dates))
+    y = np.asarray(prices, dtype=float)
+    in_market = regimes.to_mask()
+    shown = downsample_indices(y, max_points, np.concatenate([regimes.starts, regimes.ends[regimes.ends < len(y)]]))
+    x, y, in_market = x[shown], y[shown], in_market[shown]
+    ax.plot(x, y, linestyle="-", color=base_color)
+
+    # One segment from every in-market date to the next date
+    points = np.column_stack([x, y])
+    steps = np.stack([points[:-1], points[1:]], axis=1)[in_market[:-1]]
+    collection = LineCollection(steps, colors=color)
+    ax.add_collection(collection)
+
+    # Markers on every in-market date and every exit date, NaN elsewhere so nothing is drawn
+    drawn = in_market.copy()
+    drawn[1:] |= in_market[:-1]
+    ax.plot(x, np.where(drawn, y, np.nan), marker="o", markersize=markersize, color=color, linestyle="none")
+
+    ax.xaxis_date()
+    ax.autoscale_view()
+    return collection
+
+
+def _annotate(ax, annotations):
+    for annotation in annotations:
+        ax.annotate(**{"xycoords": "axes fraction", "fontsize": 10, **annotation})
+
+
+def regime_chart(dates, prices, regimes, title, ylabel, annotations=(), max_points=DEFAULT_POINT_BUDGET):
+    """Price chart with the in-market runs of `regimes` in blue, see `plot_regimes`."""
+    import matplotlib.pyplot as plt
+
+    figure, ax = plt.subplots(figsize=(14, 7))
+    plot_regimes(ax, dates, prices, regimes, max_points=max_points)
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
+    _annotate(ax, annotations)
+    figure.tight_layout()
+    return figure
+
+
+def line_chart(
+    x, y, title, xlabel, ylabel, label=None, annotations=(), max_points=DEFAULT_POINT_BUDGET, **line_options
+):
+    """
+    A single line; `line_options` go to `Axes.plot`. Above `max_points` points
+    the line is downsampled to per-bucket extremes.
+    """
+    import matplotlib.pyplot as plt
+
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    shown = downsample_indices(y, max_points)
+    figure, ax = plt.subplots(figsize=(14, 7))
+    ax.plot(x[shown], y[shown], label=label, **line_options)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if label is not None:
+        ax.legend()
+    ax.grid(True)
+    figure.tight_layout()
+    _annotate(ax, annotations)
+    return figure
+
+
+def show_figures(jobs):
+    """Build and show each figure in turn, blocking until its window is closed."""
+    import matplotlib.pyplot as plt
+
+    for _, builder, kwargs in jobs:
+        builder(**kwargs)
+        plt.show()
+
+
+def _render(job, output_dir, formats):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    name, builder, kwargs = job
+    figure = builder(**kwargs)
+    paths = []
+    for extension in formats:
+        path = os.path.join(output_dir, f"{name}.{extension}")
+        figure.savefig(path)
+        paths.append(path)
+    plt.close(figure)
+    return paths
+
+
+def render_figures(jobs, output_dir, formats=("png",), workers=1):
+    """
+    Render every job with the Agg backend to `output_dir/<name>.<format>`.
+
+    With more than one worker and more than one job the figures are built and
+    saved in a process pool; no display is needed either way. Returns the
+    written paths, grouped by job.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = list(jobs)
+    if workers <= 1 or len(jobs) <= 1:
+        return [_render(job, output_dir, formats) for job in jobs]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(_render, jobs, [output_dir] * len(jobs), [formats] * len(jobs)))
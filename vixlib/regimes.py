@@ -0,0 +1,67 @@
+"""
+Run-length encoding of in-market regimes.
+
+A long/flat mask is reduced once, with `np.diff`, to the start and end
+positions of its contiguous True runs. Plots, trade counts and per-trade
+statistics all read those positions instead of walking the mask date by date.
+"""
+import numpy as np
+
+
+class RegimeIndex:
+    """Start (inclusive) and end (exclusive) positions of every in-market run."""
+
+    def __init__(self, starts, ends, n_dates):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.n_dates = n_dates
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+        return cls(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1), len(mask))
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def lengths(self):
+        """Number of in-market dates in each run."""
+        return self.ends - self.starts
+
+    def to_mask(self):
+        edges = np.zeros(self.n_dates + 1, dtype=np.int64)
+        np.add.at(edges, self.starts, 1)
+        np.add.at(edges, self.ends, -1)
+        return np.cumsum(edges[:-1]) > 0
+
+    def clip(self, start, stop=None):
+        """The runs seen through positions [start, stop), renumbered from `start`."""
+        stop = self.n_dates if stop is None else min(stop, self.n_dates)
+        keep = (self.ends > start) & (self.starts < stop)
+        return RegimeIndex(
+            np.maximum(self.starts[keep], start) - start,
+            np.minimum(self.ends[keep], stop) - start,
+            max(stop - start, 0),
+        )
+
+    def trade_returns(self, prices):
+        """Return (%) of each run, from the price on its first date to the price on its last."""
+        prices = np.asarray(prices, dtype=float)
+        return (prices[self.ends - 1] / prices[self.starts] - 1) * 100
+
+    def trade_stats(self, prices):
+        """Trade count, win rate, average/best/worst trade return (%) and average length in dates."""
+        returns = self.trade_returns(prices)
+        if not len(returns):
+            return {"trades": 0, "win_rate": np.nan, "mean_return": np.nan,
+                    "best": np.nan, "worst": np.nan, "mean_length": np.nan}
+        return {
+            "trades": len(returns),
+            "win_rate": (returns > 0).mean() * 100,
+            "mean_return": returns.mean(),
+            "best": returns.max(),
+            "worst": returns.min(),
+            "mean_length": self.lengths.mean(),
+        }
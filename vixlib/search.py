@@ -0,0 +1,64 @@
+"""
+Adaptive parameter search.
+
+Successive halving scores every candidate on a coarse, strided subsample of
+the history, keeps the best 1/eta of them, and repeats on finer subsamples
+until the survivors are scored on every date. Most of the grid is only ever
+seen at low fidelity, so adding a dimension costs far less than in a full
+grid search.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+SearchResult = namedtuple(
+    "SearchResult",
+    [
+        "best",  # best candidate at full fidelity, None if none has a score
+        "score",  # its score
+        "evaluations",  # number of candidate evaluations, at any fidelity
+        "cost",  # the same, counted in full-history evaluations
+        "grid_size",  # evaluations a full grid search would have run
+    ],
+)
+
+
+def halving_stride(n_dates, eta=3, min_dates=252):
+    """Coarsest power-of-eta stride that still leaves `min_dates` dates to score on."""
+    stride = 1
+    while n_dates // (stride * eta) >= min_dates:
+        stride *= eta
+    return stride
+
+
+def successive_halving(candidates, evaluate, max_stride, eta=3):
+    """
+    Search `candidates` for the highest score of `evaluate(candidates, stride)`.
+
+    `evaluate` scores a list of candidates using every `stride`-th date and
+    returns one number per candidate (NaN ranks last). The first round runs at
+    `max_stride`; each following round keeps the top 1/eta candidates and
+    divides the stride by eta, ending with a round at stride 1.
+    """
+    if eta < 2:
+        raise ValueError("successive halving needs eta >= 2")
+    alive = list(candidates)
+    grid_size = len(alive)
+    stride = max(1, max_stride)
+    evaluations = 0
+    cost = 0.0
+    while alive:
+        scores = np.asarray(evaluate(alive, stride), dtype=float)
+        evaluations += len(alive)
+        cost += len(alive) / stride
+        # Highest first, NaN last, ties kept in candidate order
+        order = np.argsort(-np.where(np.isnan(scores), -np.inf, scores), kind="stable")
+        if stride == 1:
+            break
+        keep = -(-len(alive) // eta)
+        alive = [alive[i] for i in order[:keep]]
+        stride = 1 if keep == 1 else max(1, stride // eta)
+
+    if not alive or np.isnan(scores[order[0]]):
+        return SearchResult(None, np.nan, evaluations, cost, grid_size)
+    return SearchResult(alive[order[0]], float(scores[order[0]]), evaluations, cost, grid_size)
@@ -0,0 +1,112 @@
+"""
+Approximate rolling percentiles from log-bucket counts.
+
+Values are mapped to buckets whose bounds grow geometrically (the DDSketch
+layout): every value in a bucket is within `relative_accuracy` of the bucket's
+representative value. Bucket counts subtract when observations leave a
+window, so the counts of any window are the difference of two prefix counts
+and a rolling percentile costs O(1) per date whatever the lookback. Ties
+inside a bucket are treated as equal values, which is where the rank error
+comes from.
+"""
+import time
+
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+def _gamma(relative_accuracy):
+    if not 0 < relative_accuracy < 1:
+        raise ValueError("relative_accuracy must be between 0 and 1")
+    return (1 + relative_accuracy) / (1 - relative_accuracy)
+
+
+def bucket_index(values, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """Bucket of each (positive) value; NaNs must be filtered out beforehand."""
+    values = np.asarray(values, dtype=float)
+    if np.any(values <= 0):
+        raise ValueError("the log-bucket sketch only accepts positive values")
+    return np.ceil(np.log(values) / np.log(_gamma(relative_accuracy))).astype(np.int64)
+
+
+def approximate_rolling_percentile_matrix(values, lookbacks, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    Approximate counterpart of `rolling_percentile_matrix`.
+
+    Builds cumulative bucket counts per date once, then reads each
+    (date, lookback) window as the difference of two of them.
+    Same shape, NaN layout and tie convention as the exact engine.
+    """
+    data = np.asarray(values, dtype=float)
+    lookbacks = np.asarray(lookbacks, dtype=np.int64)
+    if lookbacks.ndim != 1 or len(lookbacks) == 0 or lookbacks.min() < 1:
+        raise ValueError("lookbacks must be a non-empty list of positive integers")
+
+    n = len(data)
+    result = np.full((n, len(lookbacks)), np.nan)
+    missing = np.isnan(data)
+    if missing.all():
+        return result
+
+    # Only occupied buckets matter for counting, so renumber them densely
+    buckets = np.zeros(n, dtype=np.int64)
+    occupied, buckets[~missing] = np.unique(
+        bucket_index(data[~missing], relative_accuracy), return_inverse=True
+    )
+    n_buckets = len(occupied)
+
+    # below[i, b]: observations among the first i whose bucket is < b (b runs to n_buckets)
+    per_date = np.zeros((n + 1, n_buckets + 1), dtype=np.int32)
+    rows = np.flatnonzero(~missing)
+    per_date[rows + 1, buckets[rows] + 1] = 1
+    below = np.cumsum(np.cumsum(per_date, axis=0, dtype=np.int32), axis=1, dtype=np.int32)
+    del per_date
+    missing_before = np.concatenate([[0], np.cumsum(missing)])
+
+    ends = np.arange(1, n + 1)
+    for column, lookback in enumerate(lookbacks):
+        starts = ends - lookback
+        usable = starts >= 0
+        end, start, bucket = ends[usable], starts[usable], buckets[usable]
+        less = below[end, bucket] - below[start, bucket]
+        equal = below[end, bucket + 1] - below[start, bucket + 1] - less
+        ranks = (less + (equal + 1) / 2) / lookback * 100
+        complete = missing_before[end] - missing_before[start] == 0
+        result[usable, column] = np.where(complete, ranks, np.nan)
+
+    return result
+
+
+def accuracy_report(values, lookbacks, relative_accuracies=(0.05, 0.01, 0.005)):
+    """
+    Compare the approximate engine with the exact one on the same lookbacks.
+
+    Returns a DataFrame with one row per relative accuracy: absolute error in
+    percentile points (mean, 99th percentile, max) and the wall time of each
+    engine, so precision can be traded for speed on long windows.
+    """
+    import pandas as pd
+
+    from vixlib.percentile import rolling_percentile_matrix
+
+    start = time.perf_counter()
+    exact = rolling_percentile_matrix(values, lookbacks)
+    exact_seconds = time.perf_counter() - start
+    compared = ~np.isnan(exact)
+
+    rows = []
+    for relative_accuracy in relative_accuracies:
+        start = time.perf_counter()
+        approximate = approximate_rolling_percentile_matrix(values, lookbacks, relative_accuracy)
+        approximate_seconds = time.perf_counter() - start
+        errors = np.abs(approximate[compared] - exact[compared])
+        rows.append({
+            "relative_accuracy": relative_accuracy,
+            "mean_abs_error": errors.mean() if len(errors) else np.nan,
+            "p99_abs_error": np.percentile(errors, 99) if len(errors) else np.nan,
+            "max_abs_error": errors.max() if len(errors) else np.nan,
+            "exact_seconds": exact_seconds,
+            "approximate_seconds": approximate_seconds,
+        })
+    return pd.DataFrame(rows).set_index("relative_accuracy")
@@ -0,0 +1,391 @@
+"""
+Local columnar store for FRED series.
+
+Each series lives in two memory-mappable `.npy` columns under `STORE_DIR`:
+`<SERIES>.date.npy` (int64 days since 1970-01-01) and `<SERIES>.value.npy`
+(float64, NaN where FRED reports "."). New observations are appended in place,
+so loading the full history is a pair of memory maps and never hits the network.
+
+`sync_series` keeps a per-series watermark (`<SERIES>.meta.json`) and only asks
+FRED for observations from `REVISION_DAYS` before it, overwriting revised values
+in place and appending the rest.
+
+The JSON exports (`VIXCLS.json`, `SP500.json`) stay the interchange format;
+`load_json_snapshot` keeps a binary copy of them in the same two-column layout
+under `SNAPSHOT_DIR` and regenerates it whenever the JSON is newer.
+"""
+import datetime
+import io
+import json
+import os
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+STORE_DIR = os.path.join("data", "fred")
+SNAPSHOT_DIR = os.path.join("data", "snapshots")
+FRED_OBSERVATIONS_URL = "https://api.stlouisfed.org/fred/series/observations"
+# FRED occasionally revises recent closes, so every sync re-pulls this many calendar days
+REVISION_DAYS = 14
+# Upper bound on simultaneous requests to FRED when fetching several series
+MAX_CONCURRENT_REQUESTS = 4
+
+
+def series_paths(series_id, store_dir=STORE_DIR):
+    """Paths of the date and value columns of a series."""
+    base = os.path.join(store_dir, series_id)
+    return f"{base}.date.npy", f"{base}.value.npy"
+
+
+def _meta_path(series_id, store_dir):
+    return os.path.join(store_dir, f"{series_id}.meta.json")
+
+
+def read_watermark(series_id, store_dir=STORE_DIR):
+    """Date of the last stored observation of a series, or None if it was never synced."""
+    try:
+        with open(_meta_path(series_id, store_dir), "r") as file:
+            return datetime.date.fromisoformat(json.load(file)["last_observation"])
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(series_id, last_observation, store_dir=STORE_DIR):
+    meta = {
+        "last_observation": last_observation.isoformat(),
+        "synced_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(_meta_path(series_id, store_dir), "w") as file:
+        json.dump(meta, file, indent=4)
+
+
+def parse_observations(observations):
+    """Turn FRED observation dicts into (epoch-day int64, float64) arrays."""
+    dates = np.array([item["date"] for item in observations], dtype="datetime64[D]")
+    raw = np.array([item["value"] for item in observations], dtype=object)
+    values = np.where(raw == ".", "nan", raw).astype(float)
+    return dates.astype(np.int64), values
+
+
+def fetch_fred_observations(series_id, api_key, session=None, url=FRED_OBSERVATIONS_URL, **params):
+    """
+    Download observations of a FRED series as (epoch-day, value) arrays.
+
+    Extra keyword arguments are passed as query parameters, e.g.
+    `observation_start="2024-01-01"`. `url` can point at a local stand-in.
+    """
+    import requests
+
+    query = {"series_id": series_id, "api_key": api_key, "file_type": "json", **params}
+    response = (session or requests).get(url, params=query)
+    response.raise_for_status()
+    return parse_observations(response.json()["observations"])
+
+
+def pooled_session(max_connections=MAX_CONCURRENT_REQUESTS):
+    """A requests session whose connection pool can serve `max_connections` threads at once."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _map_concurrently(function, series_ids, max_workers):
+    # Run function(series_id, session) for every series over one shared pool, keeping input order
+    from concurrent.futures import ThreadPoolExecutor
+
+    max_workers = max(1, min(max_workers, len(series_ids)))
+    with pooled_session(max_workers) as session, ThreadPoolExecutor(max_workers) as pool:
+        futures = [pool.submit(function, series_id, session) for series_id in series_ids]
+        return [future.result() for future in futures]
+
+
+def fetch_fred_batch(series_ids, api_key, max_workers=MAX_CONCURRENT_REQUESTS, **params):
+    """
+    Fetch several FRED series concurrently and align them on their dates.
+
+    Returns a DataFrame indexed by date with one column per series id; dates
+    missing from a series are NaN. At most `max_workers` requests are in flight.
+    """
+    import pandas as pd
+
+    series_ids = list(series_ids)
+    if not series_ids:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+    fetched = _map_concurrently(
+        lambda series_id, session: fetch_fred_observations(series_id, api_key, session=session, **params),
+        series_ids,
+        max_workers,
+    )
+    columns = {}
+    for series_id, (dates, values) in zip(series_ids, fetched):
+        days = dates.astype("datetime64[D]").astype("datetime64[ns]")
+        columns[series_id] = pd.Series(values, index=pd.DatetimeIndex(days, name="date"))
+    return pd.concat(columns, axis=1, sort=True)
+
+
+def _append_npy(path, array):
+    # Grow a 1-D .npy file in place: write the new rows at the end, then patch the shape in the header
+    with open(path, "r+b") as file:
+        version = npy_format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = npy_format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = npy_format.read_array_header_2_0(file)
+        header_size = file.tell()
+
+        header = io.BytesIO()
+        header_fields = {
+            "descr": npy_format.dtype_to_descr(dtype),
+            "fortran_order": fortran_order,
+            "shape": (shape[0] + len(array),),
+        }
+        if version == (1, 0):
+            npy_format.write_array_header_1_0(header, header_fields)
+        else:
+            npy_format.write_array_header_2_0(header, header_fields)
+
+        if len(header.getvalue()) != header_size:
+            # No room left to patch the header, fall back to rewriting the column
+            file.seek(0)
+            existing = npy_format.read_array(file)
+            file.seek(0)
+            file.truncate()
+            npy_format.write_array(file, np.concatenate([existing, array.astype(dtype)]))
+            return
+
+        file.seek(0, os.SEEK_END)
+        file.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        file.seek(0)
+        file.write(header.getvalue())
+
+
+def load_arrays(series_id, store_dir=STORE_DIR):
+    """Memory-map the (dates, values) columns of a stored series."""
+    date_path, value_path = series_paths(series_id, store_dir)
+    if not os.path.exists(date_path):
+        raise FileNotFoundError(
+            f"{series_id} is not in the local store ({store_dir}); run `python fred_sync.py` first"
+        )
+    return np.load(date_path, mmap_mode="r"), np.load(value_path, mmap_mode="r")
+
+
+def append_observations(series_id, dates, values, store_dir=STORE_DIR):
+    """
+    Append the observations dated after the last stored one.
+
+    Creates the series if it is not stored yet. Returns the number of rows added.
+    """
+    dates = np.asarray(dates, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    date_path, value_path = series_paths(series_id, store_dir)
+
+    if not os.path.exists(date_path):
+        os.makedirs(store_dir, exist_ok=True)
+        np.save(value_path, values)
+        np.save(date_path, dates)
+        return len(dates)
+
+    stored_dates, _ = load_arrays(series_id, store_dir)
+    last_date = stored_dates[-1] if len(stored_dates) else np.iinfo(np.int64).min
+    del stored_dates
+    new_rows = dates > last_date
+    if not new_rows.any():
+        return 0
+    # Values first: a reader only sees the new rows once the date column has grown
+    _append_npy(value_path, values[new_rows])
+    _append_npy(date_path, dates[new_rows])
+    return int(new_rows.sum())
+
+
+def load_series(series_id, store_dir=STORE_DIR):
+    """
+    Load a stored series as a DataFrame indexed by date with a "value" column,
+    the same shape the scripts used to build from the FRED response.
+    """
+    return _as_frame(*load_arrays(series_id, store_dir))
+
+
+def _as_frame(dates, values):
+    import pandas as pd
+
+    size = min(len(dates), len(values))
+    days = np.asarray(dates[:size]).astype("datetime64[D]")
+    index = pd.DatetimeIndex(days.astype("datetime64[ns]"), name="date")
+    return pd.DataFrame({"value": np.asarray(values[:size])}, index=index)
+
+
+def _read_npy_header(file):
+    version = npy_format.read_magic(file)
+    if version == (1, 0):
+        return npy_format.read_array_header_1_0(file)
+    return npy_format.read_array_header_2_0(file)
+
+
+def _open_npy(path):
+    file = open(path, "rb")
+    shape, _, dtype = _read_npy_header(file)
+    return file, shape[0], dtype
+
+
+def _read_tail(date_path, value_path, count):
+    # Seek straight to the last `count` rows of both columns instead of mapping them.
+    # Values are appended before dates, so the shorter column bounds the complete rows.
+    date_file, date_rows, date_dtype = _open_npy(date_path)
+    value_file, value_rows, value_dtype = _open_npy(value_path)
+    with date_file, value_file:
+        stop = min(date_rows, value_rows)
+        count = min(count, stop)
+        columns = []
+        for file, dtype in ((date_file, date_dtype), (value_file, value_dtype)):
+            file.seek((stop - count) * dtype.itemsize, os.SEEK_CUR)
+            columns.append(np.frombuffer(file.read(count * dtype.itemsize), dtype=dtype))
+    return tuple(columns)
+
+
+def tail_observations(series_id, count, store_dir=STORE_DIR):
+    """
+    The latest `count` (dates, values) of a stored series.
+
+    Reads only the .npy headers and the last rows, so the cost does not depend
+    on how long the history is.
+    """
+    date_path, value_path = series_paths(series_id, store_dir)
+    if not os.path.exists(date_path):
+        raise FileNotFoundError(
+            f"{series_id} is not in the local store ({store_dir}); run `python fred_sync.py` first"
+        )
+    return _read_tail(date_path, value_path, count)
+
+
+def tail_json_snapshot(json_path, count, snapshot_dir=SNAPSHOT_DIR):
+    """The latest `count` (dates, values) of a FRED JSON export, read from its binary snapshot."""
+    return _read_tail(*_refresh_json_snapshot(json_path, snapshot_dir), count)
+
+
+def load_json_snapshot(json_path, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Memory-map the (dates, values) columns of a FRED JSON export.
+
+    The JSON is parsed only when its binary snapshot is missing or older than
+    the JSON file; otherwise this is two memory maps and no parsing at all.
+    """
+    date_path, value_path = _refresh_json_snapshot(json_path, snapshot_dir)
+    return np.load(date_path, mmap_mode="r"), np.load(value_path, mmap_mode="r")
+
+
+def _refresh_json_snapshot(json_path, snapshot_dir):
+    name = os.path.splitext(os.path.basename(json_path))[0]
+    date_path, value_path = series_paths(name, snapshot_dir)
+    source_mtime = os.path.getmtime(json_path)
+    stale = not os.path.exists(date_path) or os.path.getmtime(date_path) < source_mtime
+
+    if stale:
+        with open(json_path, "r") as file:
+            dates, values = parse_observations(json.load(file))
+        os.makedirs(snapshot_dir, exist_ok=True)
+        # Write under temporary names and swap them in, dates last, so readers never see a half-written pair
+        for path, column in ((value_path, values), (date_path, dates)):
+            with open(f"{path}.tmp", "wb") as file:
+                np.save(file, column)
+            os.replace(f"{path}.tmp", path)
+
+    return date_path, value_path
+
+
+def load_json_series(json_path, snapshot_dir=SNAPSHOT_DIR):
+    """`load_json_snapshot` as a DataFrame indexed by date with a "value" column."""
+    return _as_frame(*load_json_snapshot(json_path, snapshot_dir))
+
+
+def merge_observations(series_id, dates, values, store_dir=STORE_DIR):
+    """
+    Merge a trailing slice of observations into the store.
+
+    Values of dates already stored are overwritten in place, later dates are
+    appended. A date that falls between stored ones (FRED inserting a missed
+    observation) forces a rewrite of both columns. Returns (added, revised).
+    """
+    dates = np.asarray(dates, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    date_path, value_path = series_paths(series_id, store_dir)
+    if not os.path.exists(date_path):
+        return append_observations(series_id, dates, values, store_dir), 0
+
+    stored_dates, stored_values = load_arrays(series_id, store_dir)
+    known = dates <= stored_dates[-1] if len(stored_dates) else np.zeros(len(dates), dtype=bool)
+    positions = np.searchsorted(stored_dates, dates[known])
+    matched = stored_dates[positions] == dates[known]
+    new_values = values[known]
+    changed = matched & ~(
+        (stored_values[positions] == new_values)
+        | (np.isnan(stored_values[positions]) & np.isnan(new_values))
+    )
+
+    if not matched.all():
+        merged_dates = np.concatenate([np.asarray(stored_dates), dates])
+        merged_values = np.concatenate([np.asarray(stored_values), values])
+        # Stable sort keeps the freshly downloaded value last for every duplicated date
+        order = np.argsort(merged_dates, kind="stable")
+        merged_dates, merged_values = merged_dates[order], merged_values[order]
+        keep = np.append(merged_dates[1:] != merged_dates[:-1], True)
+        added = int(keep.sum()) - len(stored_dates)
+        del stored_dates, stored_values
+        np.save(value_path, merged_values[keep])
+        np.save(date_path, merged_dates[keep])
+        return added, int(changed.sum())
+
+    del stored_dates, stored_values
+    if changed.any():
+        writable = np.load(value_path, mmap_mode="r+")
+        writable[positions[changed]] = new_values[changed]
+        writable.flush()
+        del writable
+
+    added = append_observations(series_id, dates[~known], values[~known], store_dir)
+    return added, int(changed.sum())
+
+
+def sync_series(series_id, api_key, store_dir=STORE_DIR, revision_days=REVISION_DAYS, **fetch_options):
+    """
+    Bring a stored series up to date with FRED.
+
+    The first sync downloads the full history. Later ones request observations
+    from `revision_days` before the watermark, so revised closes are corrected
+    and only the trailing slice crosses the network. Returns (added, revised).
+    """
+    watermark = read_watermark(series_id, store_dir)
+    if watermark is None or not os.path.exists(series_paths(series_id, store_dir)[0]):
+        dates, values = fetch_fred_observations(series_id, api_key, **fetch_options)
+    else:
+        start = watermark - datetime.timedelta(days=revision_days)
+        dates, values = fetch_fred_observations(
+            series_id, api_key, observation_start=start.isoformat(), **fetch_options
+        )
+
+    added, revised = merge_observations(series_id, dates, values, store_dir)
+    stored_dates, _ = load_arrays(series_id, store_dir)
+    if len(stored_dates):
+        last_day = np.datetime64(int(stored_dates[-1]), "D").item()
+        write_watermark(series_id, last_day, store_dir)
+    return added, revised
+
+
+def sync_many(series_ids, api_key, store_dir=STORE_DIR, max_workers=MAX_CONCURRENT_REQUESTS, **sync_options):
+    """
+    Sync several series concurrently over one pooled session.
+
+    Each series has its own files, so downloads and merges run side by side.
+    Returns {series_id: (added, revised)}.
+    """
+    series_ids = list(series_ids)
+    results = _map_concurrently(
+        lambda series_id, session: sync_series(series_id, api_key, store_dir, session=session, **sync_options),
+        series_ids,
+        max_workers,
+    )
+    return dict(zip(series_ids, results))
@@ -0,0 +1,486 @@
+from collections import namedtuple
+from itertools import product
+
+import numpy as np
+
+from vixlib.backtest import held_returns, hysteresis_signals, run_backtest
+from vixlib.cache import cache_key, fingerprint
+from vixlib.metrics import PERIODS_PER_YEAR, RISK_METRICS, risk_metrics
+from vixlib.search import halving_stride, successive_halving
+
+# Metrics where a higher value is better, usable to rank parameter sets
+RANKING_METRICS = ("total_return", "cagr", "sharpe", "sortino", "calmar", "max_drawdown")
+
+
+def common_positions(left_index, right_index):
+    """Integer positions of the dates shared by two indexes, in date order."""
+    common = left_index.intersection(right_index)
+    return left_index.get_indexer(common), right_index.get_indexer(common)
+
+
+def threshold_sweep_pl(prices, percentiles, thresholds, outlier_sigma=None):
+    """
+    Return (%) of going long while the percentile is below each threshold.
+
+    `prices` has shape (n_dates,) and `percentiles` either (n_dates,) or
+    (n_dates, n_lookbacks), both already aligned on the same dates. With the
+    default `outlier_sigma=None` the compounded return is the P/L from the
+    first to the last qualifying day, read directly from those two prices;
+    only the outlier filter needs the full `run_backtest` pass, which scores
+    all thresholds of a lookback as one 2-D batch of signals. Returns an array
+    of shape (n_thresholds,) or (n_lookbacks, n_thresholds); cells where no
+    day qualifies are NaN.
+    """
+    prices = np.asarray(prices, dtype=float)
+    percentiles = np.asarray(percentiles, dtype=float)
+    thresholds = np.asarray(thresholds, dtype=float)
+    single = percentiles.ndim == 1
+    if single:
+        percentiles = percentiles[:, None]
+
+    n_dates = len(prices)
+    result = np.full((percentiles.shape[1], len(thresholds)), np.nan)
+    if n_dates == 0:
+        return result[0] if single else result
+
+    for column in range(percentiles.shape[1]):
+        # (n_dates, n_thresholds); NaN percentiles compare False and are never selected
+        signals = percentiles[:, column, None] < thresholds
+        if outlier_sigma is not None:
+            result[column] = run_backtest(prices, signals, outlier_sigma).total_return
+            continue
+        found = signals.any(axis=0)
+        first = signals.argmax(axis=0)
+        last = n_dates - 1 - signals[::-1].argmax(axis=0)
+        entry = prices[first]
+        result[column] = np.where(found, (prices[last] - entry) / entry * 100, np.nan)
+
+    return result[0] if single else result
+
+
+def threshold_sweep_metrics(
+    prices, percentiles, thresholds, outlier_sigma=None, periods_per_year=PERIODS_PER_YEAR, legacy_total_return=True
+):
+    """
+    `threshold_sweep_pl`, scored by every metric in `RISK_METRICS`.
+
+    Returns a dict of arrays shaped like `threshold_sweep_pl`'s result.
+    `total_return` is `threshold_sweep_pl`'s own; the other metrics are
+    measured on the `held_returns` of each lookback, so days out of the market
+    are flat and the outlier filter does not apply to them. With
+    `legacy_total_return=False`, `total_return` is measured on the held
+    returns too and `outlier_sigma` is unused. The returns matrix of each
+    lookback goes through `risk_metrics` as one batch.
+    """
+    prices = np.asarray(prices, dtype=float)
+    percentiles = np.asarray(percentiles, dtype=float)
+    thresholds = np.asarray(thresholds, dtype=float)
+    single = percentiles.ndim == 1
+    if single:
+        percentiles = percentiles[:, None]
+
+    if legacy_total_return:
+        totals = threshold_sweep_pl(prices, percentiles, thresholds, outlier_sigma)
+    result = {name: np.full((percentiles.shape[1], len(thresholds)), np.nan) for name in RISK_METRICS}
+    for column in range(percentiles.shape[1]):
+        signals = percentiles[:, column, None] < thresholds
+        metrics = risk_metrics(held_returns(prices, signals), signals, periods_per_year)
+        if legacy_total_return:
+            metrics["total_return"] = totals[column]
+            has_result = ~np.isnan(totals[column])
+        else:
+            has_result = signals.any(axis=0)
+        # Cells without a result stay NaN for every metric
+        for name in RISK_METRICS:
+            result[name][column] = np.where(has_result, metrics[name], np.nan)
+
+    if single:
+        return {name: values[0] for name, values in result.items()}
+    return result
+
+
+def share_arrays(arrays):
+    """
+    Copy arrays into shared memory blocks.
+
+    Returns the list of `SharedMemory` handles (the caller must close and
+    unlink them) and a picklable spec that `attach_arrays` turns back into
+    read-only views in another process.
+    """
+    from multiprocessing import shared_memory
+
+    handles = []
+    spec = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        handle = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=handle.buf)[...] = array
+        handles.append(handle)
+        spec[name] = (handle.name, array.shape, array.dtype.str)
+    return handles, spec
+
+
+def attach_arrays(spec):
+    """Map the blocks described by a `share_arrays` spec without copying."""
+    from multiprocessing import shared_memory
+
+    handles = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        handle = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=handle.buf)
+        array.flags.writeable = False
+        handles.append(handle)
+        arrays[name] = array
+    return handles, arrays
+
+
+# Per-worker views of the shared sweep inputs, set up by _init_grid_worker
+_worker_handles = []
+_worker_arrays = {}
+
+
+def _init_grid_worker(spec):
+    global _worker_handles, _worker_arrays
+    _worker_handles, _worker_arrays = attach_arrays(spec)
+
+
+def _grid_row(column, thresholds, outlier_sigma):
+    prices = _worker_arrays["prices"]
+    percentiles = _worker_arrays["percentiles"][:, column]
+    return threshold_sweep_metrics(prices, percentiles, thresholds, outlier_sigma)
+
+
+def _map_shared(function, prices, percentiles, workers, *iterables):
+    """`map` over a process pool whose workers see the inputs through shared memory."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    handles, spec = share_arrays({"prices": prices, "percentiles": percentiles})
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_grid_worker, initargs=(spec,)
+        ) as pool:
+            return list(pool.map(function, *iterables))
+    finally:
+        for handle in handles:
+            handle.close()
+            handle.unlink()
+
+
+def grid_sweep(prices, percentiles, thresholds, outlier_sigma=3.0, workers=1, cache=None):
+    """
+    Risk metrics of the strategy for every (lookback column, threshold) pair.
+
+    `prices` (n_dates,) and `percentiles` (n_dates, n_lookbacks) must already be
+    aligned. With more than one worker the inputs are placed in shared memory
+    once and each process evaluates whole lookback columns against them, so
+    only column numbers and results cross the process boundary. With a
+    `vixlib.cache.ResultCache`, each column is looked up by the hash of the
+    prices and its percentiles first and only the misses are computed.
+    Returns a dict of (n_lookbacks, n_thresholds) arrays keyed by `RISK_METRICS`.
+    """
+    prices = np.ascontiguousarray(prices, dtype=float)
+    percentiles = np.ascontiguousarray(percentiles, dtype=float)
+    thresholds = list(thresholds)
+    columns = range(percentiles.shape[1])
+
+    keys = [None] * len(columns)
+    rows = [None] * len(columns)
+    if cache is not None:
+        keys = [
+            cache_key(
+                "grid_row_lagged", fingerprint(prices, percentiles[:, column]),
+                thresholds=thresholds, outlier_sigma=outlier_sigma,
+            )
+            for column in columns
+        ]
+        rows = [cache.get(key) for key in keys]
+
+    missing = [column for column in columns if rows[column] is None]
+    if workers <= 1 or len(missing) <= 1:
+        computed = [
+            threshold_sweep_metrics(prices, percentiles[:, column], thresholds, outlier_sigma)
+            for column in missing
+        ]
+    else:
+        computed = _map_shared(
+            _grid_row, prices, percentiles, workers,
+            missing, [thresholds] * len(missing), [outlier_sigma] * len(missing),
+        )
+    for column, row in zip(missing, computed):
+        rows[column] = row
+        if cache is not None:
+            cache.put(keys[column], row)
+
+    return {
+        name: np.array([row[name] for row in rows], dtype=float).reshape(len(columns), len(thresholds))
+        for name in RISK_METRICS
+    }
+
+
+WalkForwardResult = namedtuple(
+    "WalkForwardResult",
+    [
+        "folds",  # (train_start, train_stop, test_start, test_stop) positions of each fold
+        "params",  # (lookback column, threshold) picked on each training window, None if nothing traded
+        "train_scores",  # in-sample value of the ranking metric for each pick
+        "start",  # position of the first out-of-sample date
+        "signals",  # stitched out-of-sample signal, from `start` on
+        "equity",  # growth of 1 after each out-of-sample date, flat while out of the market
+        "total_return",  # out-of-sample return in %
+        "buy_and_hold_return",  # P/L in % from the first to the last out-of-sample price
+        "metrics",  # risk metrics of the stitched out-of-sample returns
+    ],
+)
+
+
+def walk_forward_folds(n_dates, train_size, test_size, anchored=False):
+    """
+    Train/test position ranges covering `n_dates` after the first training window.
+
+    Test windows of `test_size` dates follow each other without overlap (the
+    last one may be shorter). Each is trained on the `train_size` dates just
+    before it, or on all the dates before it when `anchored` is set.
+    """
+    if train_size < 2 or test_size < 1:
+        raise ValueError("walk-forward needs train_size >= 2 and test_size >= 1")
+    folds = []
+    for test_start in range(train_size, n_dates, test_size):
+        train_start = 0 if anchored else test_start - train_size
+        folds.append((train_start, test_start, test_start, min(test_start + test_size, n_dates)))
+    return folds
+
+
+def _fold_best(prices, percentiles, thresholds, rank_by):
+    scores = threshold_sweep_metrics(prices, percentiles, thresholds, legacy_total_return=False)[rank_by]
+    if np.isnan(scores).all():
+        return None, np.nan
+    column, row = np.unravel_index(np.nanargmax(scores), scores.shape)
+    return (int(column), thresholds[row]), float(scores[column, row])
+
+
+def _fold_row(fold, thresholds, rank_by):
+    train_start, train_stop = fold[:2]
+    prices = _worker_arrays["prices"][train_start:train_stop]
+    percentiles = _worker_arrays["percentiles"][train_start:train_stop]
+    return _fold_best(prices, percentiles, thresholds, rank_by)
+
+
+def walk_forward(prices, percentiles, thresholds, folds, rank_by="total_return", workers=1, cache=None):
+    """
+    Re-optimize the grid on each fold's training window and trade it out of sample.
+
+    `prices` (n_dates,) and `percentiles` (n_dates, n_lookbacks) must already be
+    aligned, and `folds` come from `walk_forward_folds`. Folds are optimized
+    independently; with more than one worker they run in a process pool that
+    maps the inputs from shared memory, as in `grid_sweep`. With a `cache`,
+    each fold's pick is keyed by the hash of its training slice, so after new
+    data is appended only the folds that see it are optimized again. The
+    parameters picked for each fold drive its test window, and the test windows
+    are backtested as one stitched signal so the equity carries across folds.
+
+    Training windows and the stitched signal are both scored on `held_returns`,
+    total return included: a signal from one close only earns the move to the
+    next one, and a fold earns nothing while it is out of the market, so the
+    result can be compared with buy and hold.
+    """
+    prices = np.ascontiguousarray(prices, dtype=float)
+    percentiles = np.ascontiguousarray(percentiles, dtype=float)
+    thresholds = list(thresholds)
+    if not folds:
+        raise ValueError("walk-forward needs at least one fold")
+
+    keys = [None] * len(folds)
+    picks = [None] * len(folds)
+    if cache is not None:
+        for i, (train_start, train_stop, _, _) in enumerate(folds):
+            keys[i] = cache_key(
+                "walk_forward_fold_lagged",
+                fingerprint(prices[train_start:train_stop], percentiles[train_start:train_stop]),
+                thresholds=thresholds, rank_by=rank_by,
+            )
+            stored = cache.get(keys[i])
+            if stored is not None:
+                column, row = int(stored["column"]), int(stored["row"])
+                params = (column, thresholds[row]) if column >= 0 else None
+                picks[i] = (params, float(stored["score"]))
+
+    missing = [i for i, pick in enumerate(picks) if pick is None]
+    if workers <= 1 or len(missing) <= 1:
+        computed = [
+            _fold_best(prices[a:b], percentiles[a:b], thresholds, rank_by)
+            for a, b, _, _ in (folds[i] for i in missing)
+        ]
+    else:
+        computed = _map_shared(
+            _fold_row, prices, percentiles, workers,
+            [folds[i] for i in missing], [thresholds] * len(missing), [rank_by] * len(missing),
+        )
+    for i, (params, score) in zip(missing, computed):
+        picks[i] = (params, score)
+        if cache is not None:
+            column, row = (params[0], thresholds.index(params[1])) if params else (-1, -1)
+            cache.put(keys[i], {"column": np.array(column), "row": np.array(row), "score": np.array(score)})
+
+    # Percentiles only look back in time, so each test window can reuse the shared matrix
+    signals = np.zeros(len(prices), dtype=bool)
+    for (_, _, test_start, test_stop), (params, _) in zip(folds, picks):
+        if params is not None:
+            column, threshold = params
+            signals[test_start:test_stop] = percentiles[test_start:test_stop, column] < threshold
+
+    start = folds[0][2]
+    stop = folds[-1][3]
+    signals = signals[start:stop]
+    returns = held_returns(prices[start:stop], signals)
+    equity = np.cumprod(returns + 1)
+    total_return = (equity[-1] - 1) * 100
+    buy_and_hold_return = (prices[stop - 1] - prices[start]) / prices[start] * 100
+    metrics = risk_metrics(returns, signals) if stop - start > 1 else None
+    return WalkForwardResult(
+        folds, [params for params, _ in picks], [score for _, score in picks], start,
+        signals, equity, total_return, buy_and_hold_return, metrics,
+    )
+
+
+def walk_forward_report(result, dates, lookbacks):
+    """
+    One row per fold of a `walk_forward` result: its train and test dates, the
+    parameters it picked, their in-sample score and their out-of-sample return.
+    """
+    import pandas as pd
+
+    lookbacks = list(lookbacks)
+    equity = np.concatenate([[1.0], result.equity])
+    rows = []
+    for (train_start, train_stop, test_start, test_stop), params, score in zip(
+        result.folds, result.params, result.train_scores
+    ):
+        start = test_start - result.start
+        stop = test_stop - result.start
+        rows.append({
+            "train_start": dates[train_start],
+            "test_start": dates[test_start],
+            "test_end": dates[test_stop - 1],
+            "lookback": lookbacks[params[0]] if params else None,
+            "threshold": params[1] if params else None,
+            "train_score": score,
+            "test_return": (equity[stop] / equity[start] - 1) * 100,
+        })
+    return pd.DataFrame(rows)
+
+
+def _hysteresis_metrics(
+    prices, percentiles, entry, exit, min_hold, cooldown, outlier_sigma, periods_per_year=PERIODS_PER_YEAR
+):
+    """`RISK_METRICS` of one percentile column's `hysteresis_signals`, NaN where nothing traded."""
+    signals = hysteresis_signals(percentiles, entry, exit, min_hold, cooldown)
+    total_return = run_backtest(prices, signals, outlier_sigma).total_return
+    metrics = risk_metrics(held_returns(prices, signals), signals, periods_per_year)
+    metrics["total_return"] = total_return
+    has_result = ~np.isnan(total_return)
+    return {name: np.where(has_result, metrics[name], np.nan) for name in RISK_METRICS}
+
+
+def candidate_metrics(prices, percentiles, candidates, stride=1):
+    """
+    `RISK_METRICS` of `adaptive_sweep` candidates, scored on every `stride`-th date.
+
+    Candidates without a band, hold or cooldown are plain threshold signals,
+    scored exactly as in `grid_sweep`; the others go through
+    `hysteresis_signals`, with holds and cooldowns rounded up to whole strides.
+    Returns a dict of (n_candidates,) arrays.
+    """
+    prices = np.asarray(prices, dtype=float)[::stride]
+    percentiles = np.asarray(percentiles, dtype=float)[::stride]
+    periods_per_year = PERIODS_PER_YEAR / stride
+    result = {name: np.full(len(candidates), np.nan) for name in RISK_METRICS}
+    groups = {}
+    for i, (column, threshold, outlier_sigma, exit_offset, min_hold, cooldown) in enumerate(candidates):
+        plain = exit_offset == 0 and min_hold == 0 and cooldown == 0
+        groups.setdefault((column, outlier_sigma, plain), []).append((i, threshold, exit_offset, min_hold, cooldown))
+    # Candidates sharing a lookback and an outlier filter run as one batch
+    for (column, outlier_sigma, plain), members in groups.items():
+        positions, entry, exit_offset, min_hold, cooldown = (np.array(values) for values in zip(*members))
+        if plain:
+            metrics = threshold_sweep_metrics(
+                prices, percentiles[:, column], entry, outlier_sigma, periods_per_year
+            )
+        else:
+            metrics = _hysteresis_metrics(
+                prices, percentiles[:, column], entry, entry + exit_offset,
+                -(-min_hold // stride), -(-cooldown // stride), outlier_sigma, periods_per_year,
+            )
+        for name in RISK_METRICS:
+            result[name][positions] = metrics[name]
+    return result
+
+
+def adaptive_sweep(
+    prices, percentiles, thresholds, outlier_sigmas=(3.0,), exit_offsets=(0,), min_holds=(0,), cooldowns=(0,),
+    rank_by="total_return", eta=3, min_dates=252,
+):
+    """
+    Successive-halving counterpart of `grid_sweep` and `hysteresis_sweep` over
+    lookback columns, thresholds, outlier filters, exit offsets, minimum holds
+    and cooldowns.
+
+    Returns a `vixlib.search.SearchResult` whose `best` is a (lookback column,
+    threshold, outlier_sigma, exit_offset, min_hold, cooldown) tuple, to be
+    scored in full with `candidate_metrics`. The first round scores the whole
+    grid on every n-th date, n being the coarsest power of `eta` that leaves
+    at least `min_dates` dates.
+    """
+    prices = np.ascontiguousarray(prices, dtype=float)
+    percentiles = np.ascontiguousarray(percentiles, dtype=float)
+    candidates = list(
+        product(range(percentiles.shape[1]), thresholds, outlier_sigmas, exit_offsets, min_holds, cooldowns)
+    )
+    return successive_halving(
+        candidates,
+        lambda alive, stride: candidate_metrics(prices, percentiles, alive, stride)[rank_by],
+        halving_stride(len(prices), eta, min_dates),
+        eta,
+    )
+
+
+def hysteresis_sweep(
+    prices, percentiles, thresholds, exit_offsets=(0,), min_holds=(0,), cooldowns=(0,), outlier_sigma=3.0
+):
+    """
+    Risk metrics of `hysteresis_signals` for every combination of lookback
+    column, entry threshold, exit offset (exit = entry + offset), minimum hold
+    and cooldown.
+
+    Each lookback runs all its combinations through a single scan and a single
+    batched backtest. As in `threshold_sweep_metrics`, `total_return` comes
+    from `run_backtest` and the other metrics from `held_returns`. Returns a
+    DataFrame with one row per combination: its parameters followed by the
+    `RISK_METRICS` columns.
+    """
+    import pandas as pd
+
+    prices = np.asarray(prices, dtype=float)
+    percentiles = np.asarray(percentiles, dtype=float)
+    if percentiles.ndim == 1:
+        percentiles = percentiles[:, None]
+    entry, offset, min_hold, cooldown = (
+        grid.ravel() for grid in np.meshgrid(thresholds, exit_offsets, min_holds, cooldowns, indexing="ij")
+    )
+
+    frames = []
+    for column in range(percentiles.shape[1]):
+        metrics = _hysteresis_metrics(
+            prices, percentiles[:, column], entry, entry + offset, min_hold, cooldown, outlier_sigma
+        )
+        frame = pd.DataFrame({
+            "lookback_column": column,
+            "threshold": entry,
+            "exit_threshold": entry + offset,
+            "min_hold": min_hold,
+            "cooldown": cooldown,
+        })
+        for name in RISK_METRICS:
+            frame[name] = metrics[name]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)